@@ -0,0 +1,290 @@
+import asyncio
+import sys
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from constants import SERVER_BULK_URL
+from encoders import decoder_for, get_encoder
+
+
+class AsyncConnectionPool:
+    def __init__(self, url: str = SERVER_BULK_URL, size: int = 8, timeout_s: float = 10.0,
+                 content_type: str = "application/json"):
+        parts = urlsplit(url)
+        self.content_type = content_type
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.path = parts.path or "/"
+        self.ssl = parts.scheme == "https"
+        self.timeout_s = timeout_s
+
+        self._sem = asyncio.Semaphore(size)
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def post_json(self, body: bytes) -> int:
+        async with self._sem:
+            for attempt in range(2):
+                reused = bool(self._idle)
+                conn = self._idle.pop() if reused else await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+                try:
+                    status, keep_alive = await asyncio.wait_for(self._request(conn, body), self.timeout_s)
+
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    conn[1].close()
+
+                    if reused and attempt == 0:
+                        continue
+
+                    raise
+
+                except BaseException:
+                    conn[1].close()
+                    raise
+
+                if keep_alive:
+                    self._idle.append(conn)
+
+                else:
+                    conn[1].close()
+
+                return status
+
+    async def _request(self, conn, body: bytes) -> Tuple[int, bool]:
+        reader, writer = conn
+        head = (f"POST {self.path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                f"Content-Type: {self.content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: keep-alive\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+
+        status = int(status_line.split()[1])
+        headers = {}
+
+        while True:
+            line = await reader.readline()
+
+            if line in (b"\r\n", b"\n", b""):
+                break
+
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        keep_alive = headers.get("connection") != "close"
+
+        if "content-length" in headers:
+            await reader.readexactly(int(headers["content-length"]))
+
+        elif headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                await reader.readexactly(size + 2)
+
+                if size == 0:
+                    break
+
+        else:
+            await reader.read()
+            keep_alive = False
+
+        return status, keep_alive
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+            try:
+                await writer.wait_closed()
+
+            except OSError:
+                pass
+
+
+class CarStream:
+    def __init__(self, car_id: str, queue_size: int):
+        self.car_id = car_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._pending: deque = deque()
+        self.max_depth: int = 0
+
+    def write(self, event: dict):
+        self._pending.append(event)
+
+    def flush(self):
+        pass
+
+    async def drain(self):
+        while self._pending:
+            await self.queue.put(self._pending.popleft())
+
+        if self.queue.qsize() > self.max_depth:
+            self.max_depth = self.queue.qsize()
+
+
+class AsyncEmitter:
+    def __init__(self, url: str = SERVER_BULK_URL, pool_size: int = 8, queue_size: int = 1000,
+                 batch_size: int = 100, max_retries: int = 3, timeout_s: float = 10.0, encoding: str = "auto"):
+        self.encoder = get_encoder(encoding)
+        self.pool = AsyncConnectionPool(url, pool_size, timeout_s, self.encoder.content_type)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+
+        self.streams: Dict[str, CarStream] = {}
+        self._workers: List[asyncio.Task] = []
+
+        self.sent: int = 0
+        self.retried: int = 0
+        self.failed: int = 0
+
+    def stream(self, car_id: str) -> CarStream:
+        if car_id not in self.streams:
+            stream = CarStream(car_id, self.queue_size)
+            self.streams[car_id] = stream
+            self._workers.append(asyncio.create_task(self._worker(stream)))
+
+        return self.streams[car_id]
+
+    async def _worker(self, stream: CarStream):
+        q = stream.queue
+
+        while True:
+            batch = [await q.get()]
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                await self._post(batch)
+
+            except Exception as e:
+                print(f"Error sending {len(batch)} events: {e!r}", file=sys.stderr)
+                self.failed += len(batch)
+
+            finally:
+                for _ in batch:
+                    q.task_done()
+
+    async def _post(self, batch: List[dict]):
+        body = self.encoder.encode(batch)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                status = await self.pool.post_json(body)
+
+                if status < 400:
+                    self.sent += len(batch)
+                    return
+
+                print(f"Error sending {len(batch)} events: {status}", file=sys.stderr)
+
+                if status < 500 and status != 429:
+                    break
+
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                print("POST error:", e, file=sys.stderr)
+
+            if attempt < self.max_retries:
+                self.retried += 1
+                await asyncio.sleep(min(2.0, 0.1 * (2 ** attempt)))
+
+        self.failed += len(batch)
+
+    def queue_depth(self) -> int:
+        return sum(stream.queue.qsize() for stream in self.streams.values())
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed, "queued": self.queue_depth(),
+                "max_stream_depth": max((st.max_depth for st in self.streams.values()), default=0)}
+
+    async def close(self):
+        for stream in self.streams.values():
+            await stream.drain()
+            await stream.queue.join()
+
+        for task in self._workers:
+            task.cancel()
+
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await self.pool.close()
+
+
+class StubServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay_s: float = 0.0):
+        self.host = host
+        self.port = port
+        self.delay_s = delay_s
+        self.requests: int = 0
+        self.events: int = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: set = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/telemetry/batch"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._handlers.add(asyncio.current_task())
+
+        try:
+            while True:
+                request_line = await reader.readline()
+
+                if not request_line:
+                    break
+
+                length = 0
+                content_type = "application/json"
+
+                while True:
+                    line = await reader.readline()
+
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+
+                    name, _, value = line.decode("latin-1").partition(":")
+
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+
+                    elif name.strip().lower() == "content-type":
+                        content_type = value.strip()
+
+                body = decoder_for(content_type).decode(await reader.readexactly(length)) if length else []
+                self.requests += 1
+                self.events += len(body) if isinstance(body, list) else 1
+
+                if self.delay_s:
+                    await asyncio.sleep(self.delay_s)
+
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+                await writer.drain()
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
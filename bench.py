@@ -0,0 +1,275 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+import constants
+import track
+from sender import CsvSink, HttpSink, NullSink
+from sim import Sim, make_sim
+from vehicle import VEHICLE_PRESETS
+
+SAMPLE_EVENT = {
+    "carId": "#34", "driver": "Nick Parke", "team": "Zenith Racing", "vehicle_class": "gt3", "lap": 3,
+    "speed": 212.345, "rpm": 6123, "gate": None, "split_time": None, "gear": 5, "throttle": 1.0, "brake": 0.0,
+    "steering_deg": -1.25, "fuel_l": 87.123, "tyre_wear": 0.0712, "lap_time": None, "race_time": 321.45,
+    "position_m": 1234.567,
+}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _result(value: float, unit: str, better: str) -> dict:
+    return {"value": value, "unit": unit, "better": better}
+
+
+def bench_update(preset_name: str, steps: int) -> dict:
+    sim = make_sim(preset_name, sink=NullSink(), seed=1)
+    update = sim.update
+    dt = sim.dt
+
+    start = time.perf_counter()
+
+    for _ in range(steps):
+        update(dt)
+
+    elapsed = time.perf_counter() - start
+    return _result(steps / elapsed, "steps/s", "higher")
+
+
+def bench_gate_check(gate_count: int, steps: int) -> dict:
+    circuit = track.get_default_track()
+    lap_length = circuit.lap_length
+    gates = {i + 1: lap_length * (i + 1) / gate_count for i in range(gate_count)}
+    params = dict(VEHICLE_PRESETS["gt3"])
+    params["preset_name"] = "gt3"
+    sim = Sim(params, circuit.segments, gates, dt=constants.DT, sink=NullSink(), seed=1)
+    s = sim.state
+    s.speed_mps = 60.0
+    step_m = s.speed_mps * sim.dt
+
+    start = time.perf_counter()
+
+    for _ in range(steps):
+        s.position_m += step_m
+        s.time_s += sim.dt
+        sim.check_gates_and_emit()
+
+    elapsed = time.perf_counter() - start
+    return _result(elapsed / steps * 1e6, "us/step", "lower")
+
+
+def bench_sink(sink, events: int) -> dict:
+    start = time.perf_counter()
+
+    for _ in range(events):
+        sink.write(dict(SAMPLE_EVENT))
+
+    sink.close()
+    elapsed = time.perf_counter() - start
+    return _result(events / elapsed, "events/s", "higher")
+
+
+def bench_http_sink(events: int) -> dict:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/api/telemetry/batch"
+        return bench_sink(HttpSink(url, queue_size=events + 1), events)
+
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_long_stint_memory(sim_time_s: float) -> dict:
+    tracemalloc.start()
+    constants.ENABLE_20HZ_LOGGING = True
+
+    try:
+        sim = make_sim("gt3", sink=NullSink(), seed=1)
+        sim.begin_run(sim_time_s)
+
+        while sim.step():
+            pass
+
+        _, peak = tracemalloc.get_traced_memory()
+
+    finally:
+        constants.ENABLE_20HZ_LOGGING = False
+        tracemalloc.stop()
+
+    return _result(peak / 1024.0, "KiB", "lower")
+
+
+class _LapTimes:
+    consumes_events = True
+
+    def __init__(self):
+        self.laps = []
+
+    def write(self, event: dict):
+        if event["lap_time"]:
+            self.laps.append(event["lap_time"])
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _flying_laps(preset_name: str, sim_time_s: float, adaptive: bool) -> list:
+    constants.ADAPTIVE_DT = adaptive
+    sink = _LapTimes()
+
+    try:
+        sim = make_sim(preset_name, sink=sink, seed=1)
+        sim.begin_run(sim_time_s)
+
+        while sim.step():
+            pass
+
+    finally:
+        constants.ADAPTIVE_DT = False
+
+    return sink.laps[1:]
+
+
+def bench_adaptive_lap_delta(preset_name: str, sim_time_s: float) -> Optional[dict]:
+    with contextlib.redirect_stdout(io.StringIO()):
+        fixed = _flying_laps(preset_name, sim_time_s, False)
+        adaptive = _flying_laps(preset_name, sim_time_s, True)
+
+    deltas = [abs(a - f) for f, a in zip(fixed, adaptive)]
+
+    if not deltas:
+        return None
+
+    return _result(sum(deltas) / len(deltas), "s/lap", "lower")
+
+
+def run_benchmarks(quick: bool = False) -> dict:
+    steps = 20_000 if quick else 200_000
+    events = 20_000 if quick else 200_000
+    results = {}
+
+    for name in VEHICLE_PRESETS:
+        results[f"update.{name}"] = bench_update(name, steps)
+
+    for gate_count in (30, 300):
+        results[f"gate_check.{gate_count}_gates"] = bench_gate_check(gate_count, steps)
+
+    results["sink.null"] = bench_sink(NullSink(), events)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results["sink.csv"] = bench_sink(CsvSink(os.path.join(tmp, "bench.csv")), events)
+
+        try:
+            from colstore import ColumnStoreSink
+            results["sink.npy"] = bench_sink(ColumnStoreSink(os.path.join(tmp, "bench_store")), events)
+
+        except ImportError:
+            pass
+
+    results["sink.http_stub"] = bench_http_sink(events // 10)
+    results["memory.long_stint_peak"] = bench_long_stint_memory(600.0 if quick else 3600.0)
+
+    for name in VEHICLE_PRESETS:
+        delta = bench_adaptive_lap_delta(name, 1200.0 if quick else 3600.0)
+
+        if delta is not None:
+            results[f"adaptive_lap_delta.{name}"] = delta
+
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+
+    for name, current in results.items():
+        base = baseline.get(name)
+
+        if base is None or not base["value"]:
+            continue
+
+        change = (current["value"] - base["value"]) / base["value"]
+
+        if (current["better"] == "higher" and change < -tolerance) or (current["better"] == "lower" and change > tolerance):
+            regressions.append((name, base["value"], current["value"], change))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulator benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Run fewer iterations, for a fast sanity check")
+    parser.add_argument("--output", type=str, default="bench_results.json", help="Where to write the results as JSON")
+    parser.add_argument("--baseline", type=str, default="bench_baseline.json", help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown before a result counts as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.quick)
+    report = {
+        "meta": {"python": sys.version.split()[0], "platform": platform.platform(), "quick": args.quick,
+                 "timestamp": time.time()},
+        "results": results,
+    }
+
+    for name, r in results.items():
+        print(f"{name:32s} {r['value']:14.2f} {r['unit']}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+        print(f"Saved baseline to {args.baseline}.")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    if baseline["meta"].get("quick") != args.quick:
+        print("Warning: baseline was recorded with a different --quick setting.")
+
+    regressions = compare(results, baseline["results"], args.tolerance)
+
+    for name, before, after, change in regressions:
+        print(f"REGRESSION {name}: {before:.2f} -> {after:.2f} ({change:+.1%})")
+
+    if regressions:
+        sys.exit(1)
+
+    print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
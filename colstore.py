@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+
+except ImportError:
+    np = None
+
+FIELDS = [
+    ("lap", "<i4"),
+    ("gate", "<i2"),
+    ("split_time", "<f8"),
+    ("speed", "<f4"),
+    ("rpm", "<i4"),
+    ("gear", "<i1"),
+    ("throttle", "<f4"),
+    ("brake", "<f4"),
+    ("steering_deg", "<f4"),
+    ("fuel_l", "<f4"),
+    ("tyre_wear", "<f4"),
+    ("lap_time", "<f8"),
+    ("race_time", "<f8"),
+    ("position_m", "<f8"),
+]
+META_FIELDS = ["carId", "driver", "team", "vehicle_class"]
+EVENT_ORDER = ["carId", "driver", "team", "vehicle_class", "lap", "speed", "rpm", "gate", "split_time", "gear", "throttle",
+               "brake", "steering_deg", "fuel_l", "tyre_wear", "lap_time", "race_time", "position_m"]
+ROUNDING = {"speed": 3, "split_time": 3, "throttle": 3, "brake": 3, "steering_deg": 2, "fuel_l": 3, "tyre_wear": 4,
+            "lap_time": 3, "race_time": 3, "position_m": 3}
+META_FILE = "meta.json"
+NUMPY_MISSING = "The columnar store needs the numpy package, which is not installed"
+
+_HEADER_BYTES = 128
+
+
+def _npy_header(dtype: str, rows: int) -> bytes:
+    header = f"{{'descr': '{dtype}', 'fortran_order': False, 'shape': ({rows},), }}"
+    header = header.ljust(_HEADER_BYTES - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode("latin-1")
+
+
+def _null_value(dtype: str):
+    return -1 if dtype[1] == "i" else float("nan")
+
+
+class ColumnStoreSink:
+    def __init__(self, directory: str, chunk_rows: int = 65_536):
+        if np is None:
+            raise ValueError(NUMPY_MISSING)
+
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.rows: int = 0
+        self.meta: Optional[dict] = None
+        self.run: Optional[dict] = None
+
+        self._buffers = {name: np.empty(chunk_rows, dtype=dtype) for name, dtype in FIELDS}
+        self._nulls = {name: _null_value(dtype) for name, dtype in FIELDS}
+        self._n: int = 0
+        self._files: Dict[str, object] = {}
+        self._error: Optional[Exception] = None
+
+    def start_run(self, run: dict):
+        self.run = run
+        meta_path = os.path.join(self.directory, META_FILE)
+
+        if self.meta is None and os.path.exists(meta_path):
+            try:
+                with open(meta_path) as f:
+                    self._check_run(json.load(f))
+
+            except ValueError as e:
+                self._error = e
+                raise
+
+    def _check_run(self, meta: dict):
+        if meta.get("run") is None or meta.get("run") != self.run:
+            raise ValueError(f"{self.directory} holds another run; only resuming that run from its snapshot can "
+                             f"extend it, so use a new directory for this run")
+
+    def _open(self, event: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path = os.path.join(self.directory, META_FILE)
+
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+
+            self.rows = self._continue_at(meta, event)
+            self.meta = meta
+
+        else:
+            self.meta = {field: event.get(field) for field in META_FIELDS}
+            self.meta["run"] = self.run
+            self.meta["created"] = time.time()
+            self.meta["columns"] = dict(FIELDS)
+            self.rows = 0
+
+        for name, dtype in FIELDS:
+            path = os.path.join(self.directory, f"{name}.npy")
+            f = open(path, "r+b" if self.rows else "w+b")
+            f.seek(_HEADER_BYTES + self.rows * np.dtype(dtype).itemsize)
+            f.truncate()
+            self._files[name] = f
+
+    def _continue_at(self, meta: dict, event: dict) -> int:
+        for field in META_FIELDS:
+            if event.get(field) != meta.get(field):
+                raise ValueError(f"{self.directory} holds {field}={meta.get(field)!r}, not {event.get(field)!r}; "
+                                 f"use a new directory for this run")
+
+        self._check_run(meta)
+        stored = meta["rows"]
+
+        if not stored:
+            return 0
+
+        laps = np.load(os.path.join(self.directory, "lap.npy"), mmap_mode="r")[:stored]
+        times = np.load(os.path.join(self.directory, "race_time.npy"), mmap_mode="r")[:stored]
+        rows = int(np.searchsorted(times, event["race_time"], side="left"))
+
+        if (rows and event["lap"] < laps[rows - 1]) or (rows < stored and event["lap"] > laps[rows]):
+            raise ValueError(f"{self.directory} has lap {laps[rows - 1] if rows else laps[0]} at t={event['race_time']:.3f}s, "
+                             f"but the resumed run is on lap {event['lap']}")
+
+        return rows
+
+    def write(self, event: dict):
+        if self._error is not None:
+            raise self._error
+
+        if self.meta is None:
+            try:
+                self._open(event)
+
+            except Exception as e:
+                self._error = e
+                raise
+
+        n = self._n
+
+        for name, buf in self._buffers.items():
+            value = event.get(name)
+            buf[n] = self._nulls[name] if value is None else value
+
+        self._n = n + 1
+
+        if self._n >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self.meta is None:
+            return
+
+        n = self._n
+        self.rows += n
+        self._n = 0
+
+        for name, dtype in FIELDS:
+            f = self._files[name]
+            f.write(self._buffers[name][:n].tobytes())
+            end = f.tell()
+            f.seek(0)
+            f.write(_npy_header(dtype, self.rows))
+            f.seek(end)
+            f.flush()
+
+        self.meta["rows"] = self.rows
+        tmp_path = os.path.join(self.directory, META_FILE + ".tmp")
+
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f, indent=2)
+
+        os.replace(tmp_path, os.path.join(self.directory, META_FILE))
+
+    def close(self):
+        self.flush()
+
+        for f in self._files.values():
+            f.close()
+
+        self._files = {}
+        self.meta = None
+
+
+class ColumnStoreReader:
+    def __init__(self, directory: str):
+        if np is None:
+            raise ValueError(NUMPY_MISSING)
+
+        self.directory = directory
+
+        with open(os.path.join(directory, META_FILE)) as f:
+            self.meta = json.load(f)
+
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.meta["columns"])
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")[:len(self)]
+
+        return self._columns[name]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.column(name)
+
+    def index_of_lap(self, lap: int) -> int:
+        return int(np.searchsorted(self.column("lap"), lap, side="left"))
+
+    def index_of_time(self, race_time: float) -> int:
+        return int(np.searchsorted(self.column("race_time"), race_time, side="left"))
+
+    def iter_events(self, start: int = 0, stop: Optional[int] = None, chunk_rows: int = 4096):
+        stop = len(self) if stop is None else min(stop, len(self))
+        dtypes = dict(FIELDS)
+        constant = {field: self.meta.get(field) for field in META_FIELDS}
+
+        for lo in range(start, stop, chunk_rows):
+            hi = min(stop, lo + chunk_rows)
+            chunk = {}
+
+            for name in EVENT_ORDER:
+                if name in dtypes:
+                    values = self.column(name)[lo:hi].tolist()
+
+                    if dtypes[name][1] == "i":
+                        chunk[name] = [None if v == -1 else v for v in values]
+
+                    else:
+                        digits = ROUNDING.get(name)
+                        chunk[name] = [None if v != v else (round(v, digits) if digits is not None else v) for v in values]
+
+            for i in range(hi - lo):
+                event = {}
+
+                for name in EVENT_ORDER:
+                    event[name] = constant[name] if name in constant else chunk[name][i]
+
+                yield event
+
+
+def open_column(directory: str, name: str) -> np.ndarray:
+    return ColumnStoreReader(directory).column(name)
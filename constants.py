@@ -1,10 +1,48 @@
 DT = 0.05
 G = 9.81
 
+ADAPTIVE_DT = False
+DT_MIN = 0.01
+DT_MAX = 0.25
+ADAPTIVE_MAX_HEADING_RAD = 0.04
+ADAPTIVE_MAX_DV_MPS = 1.0
+
+TARGET_WEAR_STEP = 0.01
+TARGET_PENALTY_STEP = 0.005
+
 SEND_TO_SERVER = False
 ENABLE_20HZ_LOGGING = False
+VERIFY_GEAR_TABLE = False
 
+OUTPUT_FORMAT = "csv"
 OUTPUT_FILE = "telemetry_log.csv"
-SERVER_URL = "http://localhost:8080/api/telemetry"
+COLUMN_STORE_DIR = "telemetry_store"
+LOG_DIR = "telemetry_logs"
+LOG_COMPRESSION = "gzip"
+LOG_ROTATE_BYTES = None
+LOG_ROTATE_LAPS = None
+LOG_ROTATE_SIM_S = None
+SERVER_BULK_URL = "http://localhost:8080/api/telemetry/batch"
+SERVER_STREAM_URL = "http://localhost:8080/api/telemetry/stream"
 
 FUEL_HEATING_VALUE_KJ_PER_KG = 44_000.0
+POWER_CURVE_STEP_RPM = 25.0
+
+CSV_FLUSH_ROWS = 1000
+CSV_FLUSH_INTERVAL_S = 1.0
+
+HTTP_BATCH_SIZE = 100
+HTTP_BATCH_INTERVAL_S = 0.25
+HTTP_QUEUE_SIZE = 10_000
+HTTP_MAX_RETRIES = 3
+EVENT_ENCODING = "auto"
+
+DELTA_STREAM = False
+DELTA_KEYFRAME_INTERVAL_S = 10.0
+DELTA_THRESHOLDS = {}
+DELTA_RATES_HZ = {}
+
+SINKS = []
+SINK_QUEUE_SIZE = 10_000
+
+METRICS_HOST = "127.0.0.1"
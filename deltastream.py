@@ -0,0 +1,198 @@
+import argparse
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+FIELD_ORDER = ["carId", "driver", "team", "vehicle_class", "lap", "speed", "rpm", "gate", "split_time", "gear", "throttle",
+               "brake", "steering_deg", "fuel_l", "tyre_wear", "lap_time", "race_time", "position_m"]
+SESSION_FIELDS = ["carId", "driver", "team", "vehicle_class"]
+GATE_FIELDS = ["gate", "split_time", "lap_time"]
+KEYS = {"carId": "c", "driver": "d", "team": "tm", "vehicle_class": "vc", "lap": "l", "speed": "v", "rpm": "r",
+        "gate": "g", "split_time": "st", "gear": "n", "throttle": "th", "brake": "b", "steering_deg": "sd",
+        "fuel_l": "f", "tyre_wear": "w", "lap_time": "lt", "race_time": "t", "position_m": "p"}
+FIELDS_BY_KEY = {key: name for name, key in KEYS.items()}
+SAMPLED_FIELDS = [name for name in FIELD_ORDER if name not in SESSION_FIELDS and name not in GATE_FIELDS and name != "race_time"]
+
+DEFAULT_THRESHOLDS = {"lap": 0, "speed": 0.1, "rpm": 10, "gear": 0, "throttle": 0.01, "brake": 0.01, "steering_deg": 0.2,
+                      "fuel_l": 0.01, "tyre_wear": 0.0005, "position_m": 0.5}
+DEFAULT_RATES_HZ = {"fuel_l": 1.0, "tyre_wear": 1.0}
+
+
+def parse_policy(spec: str) -> Tuple[Dict[str, float], Dict[str, float]]:
+    thresholds = {}
+    rates_hz = {}
+
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, rest = part.partition(":")
+        threshold, _, rate = rest.partition(":")
+
+        if name not in SAMPLED_FIELDS:
+            raise ValueError(f"Unknown delta field '{name}', expected one of: {', '.join(SAMPLED_FIELDS)}")
+
+        try:
+            if threshold:
+                thresholds[name] = float(threshold)
+
+            if rate:
+                rates_hz[name] = float(rate)
+
+        except ValueError:
+            raise ValueError(f"Bad delta policy '{part}', expected FIELD:THRESHOLD[:RATE_HZ]") from None
+
+    return thresholds, rates_hz
+
+
+class DeltaEncoder:
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None, rates_hz: Optional[Dict[str, float]] = None,
+                 keyframe_interval_s: float = 10.0):
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.min_interval_s = {name: 1.0 / hz for name, hz in {**DEFAULT_RATES_HZ, **(rates_hz or {})}.items() if hz > 0.0}
+        self.keyframe_interval_s = keyframe_interval_s
+
+        self._session: Optional[list] = None
+        self._sent: Dict[str, object] = {}
+        self._sent_at: Dict[str, float] = {}
+        self._last_keyframe: Optional[float] = None
+
+    def encode(self, event: dict) -> List[dict]:
+        frames = []
+        session = [event.get(name) for name in SESSION_FIELDS]
+
+        if session != self._session:
+            self._session = session
+            frames.append({"k": "s", **{KEYS[name]: value for name, value in zip(SESSION_FIELDS, session)}})
+            self._last_keyframe = None
+
+        t = event["race_time"]
+
+        if event.get("gate") is not None or self._last_keyframe is None or t - self._last_keyframe >= self.keyframe_interval_s:
+            frames.append(self._keyframe(event, t))
+            return frames
+
+        frame = {"k": "d", "t": t}
+
+        for name in SAMPLED_FIELDS:
+            value = event.get(name)
+            last = self._sent.get(name)
+
+            if value == last:
+                continue
+
+            if value is not None and last is not None:
+                if t - self._sent_at[name] < self.min_interval_s.get(name, 0.0) - 1e-9:
+                    continue
+
+                if abs(value - last) <= self.thresholds.get(name, 0.0) and self.thresholds.get(name, 0.0) > 0.0:
+                    continue
+
+            frame[KEYS[name]] = value
+            self._sent[name] = value
+            self._sent_at[name] = t
+
+        frames.append(frame)
+        return frames
+
+    def _keyframe(self, event: dict, t: float) -> dict:
+        frame = {"k": "f", "t": t}
+
+        for name in SAMPLED_FIELDS:
+            value = event.get(name)
+            frame[KEYS[name]] = value
+            self._sent[name] = value
+            self._sent_at[name] = t
+
+        for name in GATE_FIELDS:
+            if event.get(name) is not None:
+                frame[KEYS[name]] = event[name]
+
+        self._last_keyframe = t
+        return frame
+
+
+class DeltaDecoder:
+    def __init__(self):
+        self._session: Dict[str, object] = {}
+        self._values: Dict[str, object] = {}
+
+    def decode(self, frame: dict) -> Optional[dict]:
+        kind = frame["k"]
+
+        if kind == "s":
+            self._session = {name: frame.get(KEYS[name]) for name in SESSION_FIELDS}
+            return None
+
+        if kind == "f":
+            self._values = {}
+
+        for key, value in frame.items():
+            name = FIELDS_BY_KEY.get(key)
+
+            if name is not None and name not in GATE_FIELDS:
+                self._values[name] = value
+
+        event = {}
+
+        for name in FIELD_ORDER:
+            if name in SESSION_FIELDS:
+                event[name] = self._session.get(name)
+
+            elif name in GATE_FIELDS:
+                event[name] = frame.get(KEYS[name])
+
+            else:
+                event[name] = self._values.get(name)
+
+        return event
+
+    def decode_all(self, frames: Iterable[dict]) -> Iterator[dict]:
+        for frame in frames:
+            event = self.decode(frame)
+
+            if event is not None:
+                yield event
+
+
+class DeltaSink:
+    consumes_events = True
+
+    def __init__(self, sink, encoder: Optional[DeltaEncoder] = None):
+        self.sink = sink
+        self.encoder = encoder if encoder is not None else DeltaEncoder()
+
+    def write(self, event: dict):
+        for frame in self.encoder.encode(event):
+            self.sink.write(frame)
+
+    def flush(self):
+        self.sink.flush()
+
+    def close(self):
+        self.sink.close()
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode a delta-encoded telemetry stream back to full events")
+    parser.add_argument("input", type=str, help="Delta frames, one JSON object per line (as written by --sinks stdout --delta-stream)")
+    parser.add_argument("--output-file", type=str, default="decoded_telemetry.csv", help="CSV file for the decoded telemetry")
+    args = parser.parse_args()
+
+    from sender import CsvSink
+
+    sink = CsvSink(args.output_file)
+    count = 0
+
+    with open(args.input) as f:
+        frames = (json.loads(line) for line in f if line.startswith("{"))
+
+        for event in DeltaDecoder().decode_all(frames):
+            sink.write(event)
+            count += 1
+
+    sink.close()
+    print(f"Decoded {count} telemetry events to {args.output_file}.")
+
+
+if __name__ == "__main__":
+    main()
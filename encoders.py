@@ -0,0 +1,85 @@
+import json
+from typing import List
+
+try:
+    import orjson
+
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+
+except ImportError:
+    msgpack = None
+
+
+class JsonEncoder:
+    name = "json"
+    content_type = "application/json"
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+
+    def encode(self, events: List[dict]) -> bytes:
+        return self._encoder.encode(events).encode()
+
+    def decode(self, body: bytes):
+        return json.loads(body)
+
+
+class OrjsonEncoder:
+    name = "orjson"
+    content_type = "application/json"
+
+    def encode(self, events: List[dict]) -> bytes:
+        return orjson.dumps(events)
+
+    def decode(self, body: bytes):
+        return orjson.loads(body)
+
+
+class MsgpackEncoder:
+    name = "msgpack"
+    content_type = "application/msgpack"
+
+    def __init__(self):
+        self._packer = msgpack.Packer(autoreset=False)
+
+    def encode(self, events: List[dict]) -> bytes:
+        packer = self._packer
+        packer.reset()
+        packer.pack(events)
+        return packer.bytes()
+
+    def decode(self, body: bytes):
+        return msgpack.unpackb(body)
+
+
+ENCODERS = {"json": (JsonEncoder, json), "orjson": (OrjsonEncoder, orjson), "msgpack": (MsgpackEncoder, msgpack)}
+
+
+def available_encoders() -> List[str]:
+    return [name for name, (_, module) in ENCODERS.items() if module is not None]
+
+
+def get_encoder(name: str = "auto"):
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown encoding '{name}', expected one of: auto, {', '.join(ENCODERS)}")
+
+    cls, module = ENCODERS[name]
+
+    if module is None:
+        raise ValueError(f"The {name} encoding needs the {name} package, which is not installed")
+
+    return cls()
+
+
+def decoder_for(content_type: str):
+    if content_type.split(";")[0].strip().lower() == MsgpackEncoder.content_type:
+        return get_encoder("msgpack")
+
+    return JsonEncoder()
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import time
+from typing import Optional
+import constants
+from async_emitter import AsyncEmitter, StubServer
+from encoders import available_encoders
+from pacing import RealtimePacer
+from sim import Sim, make_sim
+import track
+
+
+async def run_car(sim: Sim, stream, sim_time_s: float, car_id: str, driver: str, team: str, yield_every: int = 20,
+                  pacer: Optional[RealtimePacer] = None):
+    sim.begin_run(sim_time_s, car_id, driver, team)
+    steps = 0
+
+    while sim.step():
+        await stream.drain()
+        steps += 1
+
+        if pacer is not None:
+            await pacer.wait_async()
+
+        elif steps % yield_every == 0:
+            await asyncio.sleep(0)
+
+    await stream.drain()
+    return sim.event_count
+
+
+async def run_grid(args) -> dict:
+    stub = None
+    url = args.url
+
+    if args.stub_server:
+        stub = StubServer(delay_s=args.stub_delay_ms / 1000.0)
+        await stub.start()
+        url = stub.url
+
+    emitter = AsyncEmitter(url, pool_size=args.pool_size, queue_size=args.queue_size, batch_size=args.batch_size,
+                           encoding=args.encoding)
+    presets = args.vehicle_presets.split(",")
+    cars = []
+    pacers = []
+
+    for i in range(args.cars):
+        car_id = f"#{i + 1}"
+        stream = emitter.stream(car_id)
+        seed = args.seed + i if args.seed is not None else None
+        sim = make_sim(presets[i % len(presets)], sink=stream, seed=seed, circuit=args.circuit)
+        pacer = RealtimePacer(constants.DT / args.realtime_speed) if args.realtime else None
+        pacers.append(pacer)
+        cars.append(run_car(sim, stream, args.stint_time_s, car_id, f"Driver {i + 1}", args.team, pacer=pacer))
+
+    start = time.perf_counter()
+    counts = await asyncio.gather(*cars)
+    await emitter.close()
+    elapsed = time.perf_counter() - start
+
+    stats = emitter.stats()
+    stats["events"] = sum(counts)
+    stats["wall_s"] = elapsed
+
+    if args.realtime:
+        stats["max_jitter_ms"] = max(p.stats()["max_jitter_ms"] for p in pacers)
+        stats["missed_ticks"] = sum(p.missed_ticks for p in pacers)
+
+    if stub is not None:
+        stats["stub_received"] = stub.events
+        await stub.close()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-car grid simulator")
+    parser.add_argument("--cars", type=int, default=20, help="Number of cars to simulate in this process.")
+    parser.add_argument("--stint-time-s", type=float, default=360.0, help="Simulated stint length in seconds, per car.")
+    parser.add_argument("--vehicle-presets", type=str, default="gt3", help="Comma separated presets, assigned to cars in turn. E.g. \"gt3,gt4\"")
+    parser.add_argument("--team", type=str, default="Zenith Racing")
+    parser.add_argument("--track", type=str, default="default", help="Track definition: a JSON file, or the name of one in tracks/")
+    parser.add_argument("--seed", type=int, default=None, help="Base random seed. Car N uses seed + N - 1")
+    parser.add_argument("--url", type=str, default=constants.SERVER_BULK_URL, help="Telemetrix bulk telemetry endpoint.")
+    parser.add_argument("--pool-size", type=int, default=8, help="Maximum concurrent connections to Telemetrix.")
+    parser.add_argument("--queue-size", type=int, default=1000, help="Per-car queue length before the car is held back.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--encoding", choices=["auto", "json", "orjson", "msgpack"], default="auto", help="Wire format for telemetry batches")
+    parser.add_argument("--enable-20hz-logging", action="store_true", help="Send all telemetry events (20 per second), not only timing gates")
+    parser.add_argument("--realtime", action="store_true", help="Pace every car against the wall clock, so events arrive at 20 Hz per car")
+    parser.add_argument("--realtime-speed", type=float, default=1.0, help="With --realtime, run this many times faster than real time")
+    parser.add_argument("--stub-server", action="store_true", help="Send to a local stand-in server instead of Telemetrix")
+    parser.add_argument("--stub-delay-ms", type=float, default=0.0, help="Response delay of the stand-in server")
+    args = parser.parse_args()
+
+    if args.encoding != "auto" and args.encoding not in available_encoders():
+        parser.error(f"--encoding {args.encoding} needs the {args.encoding} package, which is not installed")
+
+    try:
+        args.circuit = track.load_track(args.track)
+
+    except (OSError, ValueError) as e:
+        parser.error(f"Cannot load track {args.track}: {e}")
+
+    constants.ENABLE_20HZ_LOGGING = args.enable_20hz_logging
+
+    stats = asyncio.run(run_grid(args))
+    print(f"Grid of {args.cars} cars produced {stats['events']} telemetry events in {stats['wall_s']:.2f}s "
+          f"({stats['events'] / max(stats['wall_s'], 1e-9):.0f} events/s).")
+    print(f"Sent {stats['sent']}, retried {stats['retried']}, failed {stats['failed']}, "
+          f"max per-car queue depth {stats['max_stream_depth']}.")
+
+    if args.realtime:
+        print(f"Pacing: max jitter {stats['max_jitter_ms']:.3f} ms, {stats['missed_ticks']} missed ticks across all cars.")
+
+
+if __name__ == "__main__":
+    main()
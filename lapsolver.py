@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+
+except ImportError:
+    np = None
+
+import track
+from constants import G
+from track import Segment
+from utils import max_braking_force
+from vehicle import VehicleModel, VEHICLE_PRESETS
+
+
+@dataclass
+class LapSolution:
+    distance_m: np.ndarray
+    speed_mps: np.ndarray
+    gear: np.ndarray
+    rpm: np.ndarray
+    lap_time_ms: int
+    sector_times_ms: List[int]
+
+
+def gears_and_rpm(model: VehicleModel, speeds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    rpm = speeds[:, None] * np.asarray(model.rpm_per_mps)[None, :]
+    score = np.abs(rpm - model.rpm_target) + np.where(rpm > model.redline_rpm, 1e4, 0.0)
+    idx = np.argmin(score, axis=1)
+    return idx + 1, np.clip(rpm[np.arange(len(speeds)), idx], 700.0, model.redline_rpm)
+
+
+def speed_limits(model: VehicleModel, segments: List[Segment], distance: np.ndarray, tyre_wear: float = 0.0) -> np.ndarray:
+    mu = model.tyre_mu_initial * (1.0 - tyre_wear * 0.5)
+    per_segment = np.array([math.inf if speed is None else speed for speed in (track.corner_speed(seg, mu) for seg in segments)])
+    idx = np.searchsorted(track.segment_starts(segments), distance, side="right") - 1
+    return np.minimum(per_segment[idx], model.straight_target_speed)
+
+
+def _accel_tables(model: VehicleModel, v_top: float, dv: float, tyre_wear: float) -> Tuple[List[float], List[float]]:
+    v = np.arange(0.0, v_top + 2.0 * dv, dv)
+    _, rpm = gears_and_rpm(model, v)
+    drive = model.power_curve.power_kw_many(rpm) * 1000.0 * model.drivetrain_eff / np.maximum(v, 1.0)
+    resist = model.half_rho_cda * v ** 2 + model.F_roll
+
+    mu = model.tyre_mu_initial * (1.0 - tyre_wear * 0.5)
+    brake = max_braking_force(model.mass_with_fuel_kg, mu, G, model.brake_max_g)
+    return ((drive - resist) / model.mass_with_fuel_kg).tolist(), ((brake + resist) / model.mass_with_fuel_kg).tolist()
+
+
+def _pass(limits: List[float], table: List[float], inv_dv: float, ds: float) -> List[float]:
+    last = len(table) - 1
+    v = limits[0]
+    out = [v]
+
+    for lim in limits[1:]:
+        a = table[min(int(v * inv_dv), last)]
+        v = min(lim, math.sqrt(max(0.0, v * v + 2.0 * a * ds)))
+        out.append(v)
+
+    return out
+
+
+def solve_lap(params: dict, segments: Optional[List[Segment]] = None, gates: Optional[Dict[int, float]] = None,
+              ds: float = 1.0, tyre_wear: float = 0.0, dv: float = 0.05) -> LapSolution:
+    if np is None:
+        raise ValueError("The lap solver needs the numpy package, which is not installed")
+
+    if segments is None or gates is None:
+        circuit = track.get_default_track()
+        segments = circuit.segments if segments is None else segments
+        gates = circuit.gates if gates is None else gates
+
+    model = VehicleModel(params)
+    lap_length = segments[-1].cumulative_end
+    n = max(2, int(math.ceil(lap_length / ds)))
+    ds = lap_length / n
+    distance = np.arange(n) * ds
+
+    limits = speed_limits(model, segments, distance, tyre_wear)
+    accel, decel = _accel_tables(model, float(limits.max()), dv, tyre_wear)
+
+    two_laps = np.concatenate([limits, limits]).tolist()
+    forward = _pass(two_laps, accel, 1.0 / dv, ds)[n:]
+    backward = _pass(two_laps[::-1], decel, 1.0 / dv, ds)[::-1][:n]
+    speed = np.minimum(forward, backward)
+
+    gear, rpm = gears_and_rpm(model, speed)
+
+    v_next = np.roll(speed, -1)
+    elapsed = np.concatenate([[0.0], np.cumsum(2.0 * ds / np.maximum(speed + v_next, 1e-6))])
+    at = np.append(distance, lap_length)
+
+    gate_times = [float(np.interp(gates[g] if gates[g] > 0.0 else lap_length, at, elapsed)) for g in sorted(gates)]
+    sector_times_ms = [int(round((t1 - t0) * 1000.0)) for t0, t1 in zip([0.0] + gate_times, gate_times)]
+
+    return LapSolution(distance_m=distance, speed_mps=speed, gear=gear, rpm=rpm,
+                       lap_time_ms=int(round(elapsed[-1] * 1000.0)), sector_times_ms=sector_times_ms)
+
+
+def solve_preset(preset_name: str, ds: float = 1.0, tyre_wear: float = 0.0, circuit: Optional[track.Track] = None) -> LapSolution:
+    circuit = circuit or track.get_default_track()
+    return solve_lap(VEHICLE_PRESETS[preset_name], circuit.segments, circuit.gates, ds=ds, tyre_wear=tyre_wear)
+
+
+def format_lap_time(ms: int) -> str:
+    return f"{ms // 60000}:{ms % 60000 / 1000.0:06.3f}"
+
+
+def write_trace(solution: LapSolution, path: str):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["position_m", "speed", "gear", "rpm"])
+
+        for d, v, g, r in zip(solution.distance_m.tolist(), solution.speed_mps.tolist(), solution.gear.tolist(),
+                              solution.rpm.tolist()):
+            writer.writerow([round(d, 3), round(v * 3.6, 3), g, int(round(r))])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quasi-steady-state lap time solver")
+    parser.add_argument("--vehicle-presets", type=str, default="gt3", help="Comma separated presets to solve. E.g. \"gt3,f1\"")
+    parser.add_argument("--track", type=str, default="default", help="Track definition: a JSON file, or the name of one in tracks/")
+    parser.add_argument("--tyre-wear", type=float, default=0.0, help="Tyre wear (0-1) used for the grip limit")
+    parser.add_argument("--ds", type=float, default=1.0, help="Distance between solver points, in metres")
+    parser.add_argument("--sectors", action="store_true", help="Print the time of every gate-to-gate sector")
+    parser.add_argument("--trace", type=str, default=None, help="Write the speed, gear and rpm trace to this CSV file (single preset only)")
+    args = parser.parse_args()
+
+    if np is None:
+        parser.error("The lap solver needs the numpy package, which is not installed")
+
+    presets = args.vehicle_presets.split(",")
+    unknown = [p for p in presets if p not in VEHICLE_PRESETS]
+
+    if unknown:
+        parser.error(f"Unknown vehicle preset(s): {', '.join(unknown)}")
+
+    if args.trace and len(presets) > 1:
+        parser.error("--trace needs a single preset")
+
+    try:
+        circuit = track.load_track(args.track)
+
+    except (OSError, ValueError) as e:
+        parser.error(f"Cannot load track {args.track}: {e}")
+
+    for preset_name in presets:
+        solution = solve_preset(preset_name, args.ds, args.tyre_wear, circuit)
+        print(f"{preset_name:<8} {format_lap_time(solution.lap_time_ms)}  top speed {solution.speed_mps.max() * 3.6:.1f} km/h")
+
+        if args.sectors:
+            print("  " + " ".join(str(ms) for ms in solution.sector_times_ms))
+
+        if args.trace:
+            write_trace(solution, args.trace)
+
+
+if __name__ == "__main__":
+    main()
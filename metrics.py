@@ -0,0 +1,167 @@
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Sequence
+
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_S):
+        self.buckets = list(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum: float = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def render(self, name: str, labels: str = "") -> List[str]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        sep = "," if labels else ""
+        lines = []
+        cumulative = 0
+
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+
+        cumulative += counts[-1]
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {total}")
+        lines.append(f"{name}_count{suffix} {cumulative}")
+        return lines
+
+
+class SimCollector:
+    def __init__(self, sim, sink):
+        self.sim = sim
+        self.sink = sink
+        self._start_wall = time.monotonic()
+
+    def collect(self) -> str:
+        sim = self.sim
+        sink = self.sink
+
+        sink_label = f'sink="{type(sink).__name__}"'
+        lines = [
+            "# HELP telemetrix_sim_time_seconds_total Simulated time so far.",
+            "# TYPE telemetrix_sim_time_seconds_total counter",
+            f"telemetrix_sim_time_seconds_total {sim.state.time_s}",
+            "# HELP telemetrix_sim_wall_seconds_total Wall-clock time since the run started.",
+            "# TYPE telemetrix_sim_wall_seconds_total counter",
+            f"telemetrix_sim_wall_seconds_total {time.monotonic() - self._start_wall}",
+            "# HELP telemetrix_sim_steps_total Simulation steps taken.",
+            "# TYPE telemetrix_sim_steps_total counter",
+            f"telemetrix_sim_steps_total {sim.step_count}",
+            "# HELP telemetrix_sim_events_total Telemetry events written to the sink.",
+            "# TYPE telemetrix_sim_events_total counter",
+            f"telemetrix_sim_events_total{{{sink_label}}} {sim.written_count}",
+        ]
+
+        children = getattr(sink, "sinks", [])
+
+        if children:
+            lines += [
+                "# HELP telemetrix_sink_written_total Events written by each fan-out sink.",
+                "# TYPE telemetrix_sink_written_total counter",
+            ]
+            lines += [f'telemetrix_sink_written_total{{sink="{child.name}"}} {child.written}' for child in children]
+            lines += [
+                "# HELP telemetrix_sink_dropped_total Events dropped by each fan-out sink because its queue was full.",
+                "# TYPE telemetrix_sink_dropped_total counter",
+            ]
+            lines += [f'telemetrix_sink_dropped_total{{sink="{child.name}"}} {child.dropped}' for child in children]
+
+        queued = [(f'sink="{child.name}"', child) for child in children] or [(sink_label, sink)]
+
+        if any(hasattr(q, "queue_depth") for _, q in queued):
+            lines += [
+                "# HELP telemetrix_sender_queue_depth Events waiting in the sender queue.",
+                "# TYPE telemetrix_sender_queue_depth gauge",
+            ]
+            lines += [f"telemetrix_sender_queue_depth{{{label}}} {q.queue_depth()}" for label, q in queued
+                      if hasattr(q, "queue_depth")]
+
+        http = next((q for q in [sink] + [child.sink for child in children] if hasattr(q, "latency")), None)
+
+        if http is not None:
+            stats = http.stats()
+            lines += [
+                "# HELP telemetrix_sender_events_total Events by delivery outcome.",
+                "# TYPE telemetrix_sender_events_total counter",
+            ]
+
+            for outcome in ("sent", "dropped", "failed"):
+                lines.append(f'telemetrix_sender_events_total{{outcome="{outcome}"}} {stats[outcome]}')
+
+            lines += [
+                "# HELP telemetrix_sender_retries_total Batch POSTs that were retried.",
+                "# TYPE telemetrix_sender_retries_total counter",
+                f"telemetrix_sender_retries_total {stats['retried']}",
+                "# HELP telemetrix_sender_errors_total Failed batch POST attempts by kind.",
+                "# TYPE telemetrix_sender_errors_total counter",
+            ]
+
+            for kind, count in sorted(stats["errors"].items()):
+                lines.append(f'telemetrix_sender_errors_total{{kind="{kind}"}} {count}')
+
+            lines += [
+                "# HELP telemetrix_sender_request_seconds Latency of batch POST attempts.",
+                "# TYPE telemetrix_sender_request_seconds histogram",
+            ]
+            lines += http.latency.render("telemetrix_sender_request_seconds")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    def __init__(self, collect: Callable[[], str], host: str = "127.0.0.1", port: int = 9108):
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                with lock:
+                    body = collect().encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="telemetrix-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,363 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+import constants
+import track
+from sender import NullSink
+from sim import make_sim
+from vehicle import VEHICLE_PRESETS
+
+DRIVER_PARAMS = ("driver_skill", "aggressiveness", "steering_noise_std_deg", "steering_response_time", "lap_bias_std_deg",
+                 "steering_ratio_variation")
+DEFAULT_VARY = {"driver_skill": (0.8, 0.95), "aggressiveness": (0.3, 0.7), "steering_noise_std_deg": (1.0, 2.0)}
+QUANTILES = (0.05, 0.5, 0.95)
+LAP_FIELDS = ["stint", "lap", "lap_time", "fuel_used_l", "fuel_l", "tyre_wear", "race_time"]
+
+
+class P2Quantile:
+    def __init__(self, p: float):
+        self.p = p
+        self._initial: List[float] = []
+        self._q: Optional[List[float]] = None
+        self._n: List[int] = []
+        self._want: List[float] = []
+        self._step = [0.0, p / 2.0, p, (1.0 + p) / 2.0, 1.0]
+
+    def add(self, x: float):
+        q = self._q
+
+        if q is None:
+            self._initial.append(x)
+
+            if len(self._initial) == 5:
+                self._q = sorted(self._initial)
+                self._n = [0, 1, 2, 3, 4]
+                self._want = [0.0, 2.0 * self.p, 4.0 * self.p, 2.0 + 2.0 * self.p, 4.0]
+
+            return
+
+        n = self._n
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+
+        else:
+            k = bisect_right(q, x) - 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+
+        for i in range(5):
+            self._want[i] += self._step[i]
+
+        for i in (1, 2, 3):
+            d = self._want[i] - n[i]
+
+            if (d >= 1.0 and n[i + 1] - n[i] > 1) or (d <= -1.0 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0.0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * ((n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                                                         + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+                q[i] = qp
+                n[i] += d
+
+    def value(self) -> Optional[float]:
+        if self._q is not None:
+            return self._q[2]
+
+        if not self._initial:
+            return None
+
+        values = sorted(self._initial)
+        return values[int(round(self.p * (len(values) - 1)))]
+
+
+class RunningStats:
+    def __init__(self, quantiles: Sequence[float] = QUANTILES):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.quantiles = [P2Quantile(p) for p in quantiles]
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+        for q in self.quantiles:
+            q.add(x)
+
+    def to_dict(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+
+        result = {"count": self.count, "mean": self.mean,
+                  "std": (self._m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0, "min": self.min, "max": self.max}
+
+        for q in self.quantiles:
+            result[f"p{round(q.p * 100):02d}"] = q.value()
+
+        return result
+
+
+def parse_vary(specs: Sequence[str]) -> Dict[str, Tuple[float, float]]:
+    ranges = {}
+
+    for spec in specs:
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            name, _, values = part.partition("=")
+
+            if name not in DRIVER_PARAMS:
+                raise ValueError(f"Unknown driver parameter '{name}', expected one of: {', '.join(DRIVER_PARAMS)}")
+
+            try:
+                ranges[name] = parse_range(values)
+
+            except ValueError:
+                raise ValueError(f"Bad range '{part}', expected NAME=LOW:HIGH or NAME=VALUE") from None
+
+    return ranges
+
+
+def parse_range(spec: str) -> Tuple[float, float]:
+    low, _, high = spec.partition(":")
+    return float(low), float(high) if high else float(low)
+
+
+def make_stints(count: int, seed: int, preset_name: str, vary: Dict[str, Tuple[float, float]],
+                fuel_l: Optional[Tuple[float, float]]) -> List[dict]:
+    rng = random.Random(seed)
+    capacity = VEHICLE_PRESETS[preset_name]["fuel_capacity_l"]
+    stints = []
+
+    for i in range(count):
+        overrides = {name: rng.uniform(low, high) for name, (low, high) in sorted(vary.items())}
+        fuel = min(capacity, rng.uniform(*fuel_l)) if fuel_l is not None else capacity
+        stints.append({"stint": i, "seed": rng.randrange(2 ** 32), "overrides": overrides, "fuel_l": fuel})
+
+    return stints
+
+
+_circuit = None
+_preset_name = "gt3"
+_stint_time_s = 3600.0
+
+
+def _init_worker(track_path: str, preset_name: str, stint_time_s: float, adaptive_dt: bool):
+    global _circuit, _preset_name, _stint_time_s
+
+    _circuit = track.load_track(track_path)
+    _preset_name = preset_name
+    _stint_time_s = stint_time_s
+    constants.ENABLE_20HZ_LOGGING = False
+    constants.ADAPTIVE_DT = adaptive_dt
+
+
+def run_stint(stint: dict) -> dict:
+    preset = VEHICLE_PRESETS[_preset_name]
+    overrides = dict(stint["overrides"])
+    overrides["mass_kg_with_fuel"] = preset["mass_kg"] + stint["fuel_l"] * preset["fuel_density_kg_per_l"]
+
+    sim = make_sim(_preset_name, sink=NullSink(), seed=stint["seed"], circuit=_circuit, overrides=overrides)
+    s = sim.state
+    s.fuel_l = stint["fuel_l"]
+
+    laps = []
+    lap_start = sim.last_lap_start_time
+    lap_fuel = s.fuel_l
+    lap_no = s.lap
+    fuel_out = False
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.begin_run(_stint_time_s)
+
+        running = True
+
+        while running:
+            running = sim.step()
+
+            if sim.last_lap_start_time != lap_start:
+                laps.append([stint["stint"], lap_no, sim.last_lap_start_time - lap_start, lap_fuel - s.fuel_l, s.fuel_l,
+                             s.tyre_wear, s.time_s])
+
+                lap_start = sim.last_lap_start_time
+                lap_fuel = s.fuel_l
+                lap_no = s.lap
+
+            if s.fuel_l <= 0.0:
+                fuel_out = True
+                break
+
+    return {"stint": stint, "laps": laps, "steps": sim.step_count, "sim_time_s": s.time_s, "fuel_out": fuel_out}
+
+
+class StrategySummary:
+    def __init__(self):
+        self.lap = {name: RunningStats() for name in ("lap_time", "fuel_used_l", "tyre_wear")}
+        self.stint = {name: RunningStats() for name in ("laps", "best_lap_time", "fuel_used_l", "final_tyre_wear")}
+        self.lap_time_by_lap: Dict[int, RunningStats] = {}
+        self.stints = 0
+        self.fuel_outs = 0
+        self.steps = 0
+        self.sim_time_s = 0.0
+
+    def add(self, result: dict):
+        laps = result["laps"]
+
+        for _, lap_no, lap_time, fuel_used, _, tyre_wear, _ in laps:
+            if lap_no not in self.lap_time_by_lap:
+                self.lap_time_by_lap[lap_no] = RunningStats()
+
+            self.lap_time_by_lap[lap_no].add(lap_time)
+
+            if lap_no == 1:
+                continue
+
+            self.lap["lap_time"].add(lap_time)
+            self.lap["fuel_used_l"].add(fuel_used)
+            self.lap["tyre_wear"].add(tyre_wear)
+
+        flying = [lap[2] for lap in laps if lap[1] > 1]
+        self.stint["laps"].add(len(laps))
+
+        if laps:
+            if flying:
+                self.stint["best_lap_time"].add(min(flying))
+
+            self.stint["fuel_used_l"].add(result["stint"]["fuel_l"] - laps[-1][4])
+            self.stint["final_tyre_wear"].add(laps[-1][5])
+
+        self.stints += 1
+        self.fuel_outs += result["fuel_out"]
+        self.steps += result["steps"]
+        self.sim_time_s += result["sim_time_s"]
+
+    def to_dict(self) -> dict:
+        return {
+            "stints": self.stints,
+            "fuel_outs": self.fuel_outs,
+            "steps": self.steps,
+            "sim_time_s": self.sim_time_s,
+            "per_lap": {name: stats.to_dict() for name, stats in self.lap.items()},
+            "per_stint": {name: stats.to_dict() for name, stats in self.stint.items()},
+            "lap_time_by_lap": {str(lap_no): stats.to_dict() for lap_no, stats in sorted(self.lap_time_by_lap.items())},
+        }
+
+    def table(self) -> str:
+        lines = [f"{'metric':<24}{'n':>8}{'mean':>10}{'p05':>10}{'p50':>10}{'p95':>10}{'min':>10}{'max':>10}"]
+
+        for scope, group in (("lap", self.lap), ("stint", self.stint)):
+            for name, stats in group.items():
+                d = stats.to_dict()
+
+                if d["count"]:
+                    lines.append(f"{scope + '.' + name:<24}{d['count']:>8}" + "".join(
+                        f"{d[k]:>10.3f}" for k in ("mean", "p05", "p50", "p95", "min", "max")))
+
+        return "\n".join(lines)
+
+
+def run_batch(stints: List[dict], workers: Optional[int], track_path: str, preset_name: str, stint_time_s: float,
+              adaptive_dt: bool = False, on_result=None) -> StrategySummary:
+    summary = StrategySummary()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(track_path, preset_name, stint_time_s, adaptive_dt)) as pool:
+        for result in pool.map(run_stint, stints):
+            summary.add(result)
+
+            if on_result is not None:
+                on_result(result)
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo stint strategy runs")
+    parser.add_argument("--stints", type=int, default=100, help="Number of stints to simulate")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes. Defaults to the number of CPUs")
+    parser.add_argument("--vehicle-preset", type=str, default="gt3", help="Vehicle preset for every stint. E.g. \"f1\"")
+    parser.add_argument("--track", type=str, default="default", help="Track definition: a JSON file, or the name of one in tracks/")
+    parser.add_argument("--stint-time-s", type=float, default=3600.0, help="Simulated length of each stint, in seconds")
+    parser.add_argument("--vary", action="append", default=[], help="Driver parameters to sample uniformly, e.g. \"driver_skill=0.8:0.95,aggressiveness=0.3:0.7\". Defaults to skill, aggressiveness and steering noise")
+    parser.add_argument("--fuel-l", type=str, default=None, help="Starting fuel load in litres, LOW:HIGH to sample it. Defaults to a full tank")
+    parser.add_argument("--seed", type=int, default=1, help="Base seed. The same seed gives the same stints, whatever the number of workers")
+    parser.add_argument("--adaptive-dt", action="store_true", help="Use the adaptive integration step, for fewer steps per stint")
+    parser.add_argument("--laps-csv", type=str, default=None, help="Write every lap summary to this CSV file as stints finish")
+    parser.add_argument("--output-json", type=str, default=None, help="Write the distribution summary to this JSON file")
+    args = parser.parse_args()
+
+    if args.vehicle_preset not in VEHICLE_PRESETS:
+        parser.error(f"Unknown vehicle preset '{args.vehicle_preset}'")
+
+    if args.stints <= 0 or (args.workers is not None and args.workers <= 0):
+        parser.error("--stints and --workers must be positive")
+
+    try:
+        vary = parse_vary(args.vary) if args.vary else dict(DEFAULT_VARY)
+        fuel_l = parse_range(args.fuel_l) if args.fuel_l else None
+        track_path = track.load_track(args.track).source
+
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    stints = make_stints(args.stints, args.seed, args.vehicle_preset, vary, fuel_l)
+    laps_file = open(args.laps_csv, "w", newline="") if args.laps_csv else None
+    on_result = None
+
+    if laps_file is not None:
+        writer = csv.writer(laps_file)
+        writer.writerow(LAP_FIELDS + ["seed", "start_fuel_l"] + sorted(vary))
+
+        def on_result(result: dict):
+            stint = result["stint"]
+            extra = [stint["seed"], stint["fuel_l"]] + [stint["overrides"][name] for name in sorted(vary)]
+            writer.writerows(lap + extra for lap in result["laps"])
+
+    start = time.perf_counter()
+
+    try:
+        summary = run_batch(stints, args.workers, track_path, args.vehicle_preset, args.stint_time_s, args.adaptive_dt,
+                            on_result)
+
+    finally:
+        if laps_file is not None:
+            laps_file.close()
+
+    elapsed = time.perf_counter() - start
+    print(summary.table())
+    print(f"{summary.stints} stints, {summary.lap['lap_time'].count} flying laps in {elapsed:.1f}s "
+          f"({summary.sim_time_s / elapsed:.0f} simulated s per wall s, {summary.steps / elapsed:.0f} steps/s, "
+          f"{args.workers or os.cpu_count()} workers)")
+
+    if summary.fuel_outs:
+        print(f"{summary.fuel_outs} stints ran out of fuel and were stopped early.")
+
+    if args.output_json:
+        with open(args.output_json, "w") as f:
+            json.dump(summary.to_dict(), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import asyncio
+import math
+import time
+from typing import Optional
+
+
+class RealtimePacer:
+    def __init__(self, period_s: float, clock=time.monotonic):
+        self.period_s = period_s
+        self.clock = clock
+        self._start: Optional[float] = None
+        self._tick: int = 0
+
+        self.ticks: int = 0
+        self.late_ticks: int = 0
+        self.missed_ticks: int = 0
+        self.max_lateness_s: float = 0.0
+        self._mean: float = 0.0
+        self._m2: float = 0.0
+
+    def _next_delay(self) -> float:
+        now = self.clock()
+
+        if self._start is None:
+            self._start = now
+            return 0.0
+
+        self._tick += 1
+        return self._start + self._tick * self.period_s - now
+
+    def _record(self):
+        lateness = self.clock() - (self._start + self._tick * self.period_s)
+        self.ticks += 1
+
+        if lateness > 0.001:
+            self.late_ticks += 1
+
+        if lateness > self.period_s:
+            self.missed_ticks += 1
+
+        self.max_lateness_s = max(self.max_lateness_s, lateness)
+        delta = lateness - self._mean
+        self._mean += delta / self.ticks
+        self._m2 += delta * (lateness - self._mean)
+
+    def wait(self):
+        delay = self._next_delay()
+
+        if delay > 0.0:
+            time.sleep(delay)
+
+        self._record()
+
+    async def wait_async(self):
+        delay = self._next_delay()
+
+        if delay > 0.0:
+            await asyncio.sleep(delay)
+
+        self._record()
+
+    def stats(self) -> dict:
+        return {
+            "ticks": self.ticks,
+            "late_ticks": self.late_ticks,
+            "missed_ticks": self.missed_ticks,
+            "mean_jitter_ms": self._mean * 1000.0,
+            "stdev_jitter_ms": math.sqrt(self._m2 / self.ticks) * 1000.0 if self.ticks else 0.0,
+            "max_jitter_ms": self.max_lateness_s * 1000.0,
+        }
+
+    def report(self) -> str:
+        st = self.stats()
+        return (f"Pacing at {1.0 / self.period_s:.1f} Hz: {st['ticks']} ticks, jitter mean {st['mean_jitter_ms']:.3f} ms, "
+                f"stdev {st['stdev_jitter_ms']:.3f} ms, max {st['max_jitter_ms']:.3f} ms, "
+                f"{st['late_ticks']} late (>1 ms), {st['missed_ticks']} missed (>1 period).")
@@ -0,0 +1,46 @@
+import json
+from typing import Dict
+
+PHASES = ["segment", "driver", "controls", "gear", "forces", "gates", "emit.build", "emit.sink"]
+
+
+class PhaseProfiler:
+    def __init__(self):
+        self.totals: Dict[str, float] = {phase: 0.0 for phase in PHASES}
+        self.counts: Dict[str, int] = {phase: 0 for phase in PHASES}
+        self.run_total_s: float = 0.0
+
+    def add(self, phase: str, elapsed_s: float, calls: int = 1):
+        self.totals[phase] = self.totals.get(phase, 0.0) + elapsed_s
+        self.counts[phase] = self.counts.get(phase, 0) + calls
+
+    def to_dict(self) -> dict:
+        tracked = sum(self.totals.values())
+        phases = {
+            phase: {
+                "calls": self.counts[phase],
+                "total_s": total,
+                "mean_us": total / self.counts[phase] * 1e6 if self.counts[phase] else 0.0,
+                "share": total / self.run_total_s if self.run_total_s else 0.0,
+            }
+            for phase, total in self.totals.items()
+        }
+        return {"steps": self.counts["segment"], "run_total_s": self.run_total_s,
+                "untracked_s": max(0.0, self.run_total_s - tracked), "phases": phases}
+
+    def summary(self) -> str:
+        data = self.to_dict()
+        lines = [f"{'phase':<12}{'calls':>12}{'total ms':>12}{'mean us':>10}{'share':>8}"]
+
+        for phase, p in data["phases"].items():
+            lines.append(f"{phase:<12}{p['calls']:>12}{p['total_s'] * 1e3:>12.1f}{p['mean_us']:>10.2f}{p['share']:>8.1%}")
+
+        run_total = data["run_total_s"]
+        untracked = data["untracked_s"]
+        lines.append(f"{'untracked':<12}{'':>12}{untracked * 1e3:>12.1f}{'':>10}{(untracked / run_total if run_total else 0.0):>8.1%}")
+        lines.append(f"{'run total':<12}{data['steps']:>12}{run_total * 1e3:>12.1f}")
+        return "\n".join(lines)
+
+    def export_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,243 @@
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from bisect import bisect_left
+from typing import Iterator, Optional
+import colstore
+import constants
+import sender
+
+INT_FIELDS = {"lap", "rpm", "gate", "gear"}
+STR_FIELDS = {"carId", "driver", "team", "vehicle_class"}
+
+
+def _convert(name: str, value: str):
+    if name in STR_FIELDS:
+        return value
+
+    if value == "":
+        return None
+
+    return int(value) if name in INT_FIELDS else float(value)
+
+
+class CsvSource:
+    def __init__(self, path: str, time_index_every: int = 200):
+        self.path = path
+        self.time_index_every = time_index_every
+        self.index_path = path + ".idx"
+
+        with open(path, "rb") as f:
+            self.fieldnames = next(csv.reader([f.readline().decode()]))
+            self._data_start = f.tell()
+
+        self.index = self._load_or_build_index()
+
+    def _load_or_build_index(self) -> dict:
+        st = os.stat(self.path)
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                index = json.load(f)
+
+            if index.get("size") == st.st_size and index.get("mtime") == st.st_mtime:
+                return index
+
+        lap_col = self.fieldnames.index("lap")
+        time_col = self.fieldnames.index("race_time")
+        laps = []
+        times = []
+        last_lap = None
+        row = 0
+
+        with open(self.path, "rb") as f:
+            f.seek(self._data_start)
+            offset = self._data_start
+
+            for line in f:
+                values = next(csv.reader([line.decode()]))
+                lap = int(values[lap_col])
+
+                if lap != last_lap:
+                    laps.append([lap, offset])
+                    last_lap = lap
+
+                if row % self.time_index_every == 0:
+                    times.append([float(values[time_col]), offset])
+
+                offset += len(line)
+                row += 1
+
+        index = {"size": st.st_size, "mtime": st.st_mtime, "rows": row, "laps": laps, "times": times}
+
+        with open(self.index_path, "w") as f:
+            json.dump(index, f)
+
+        return index
+
+    def offset_of_lap(self, lap: int) -> Optional[int]:
+        for indexed_lap, offset in self.index["laps"]:
+            if indexed_lap == lap:
+                return offset
+
+        return None
+
+    def offset_of_time(self, race_time: float) -> int:
+        times = [t for t, _ in self.index["times"]]
+        i = bisect_left(times, race_time)
+        return self.index["times"][max(0, i - 1)][1] if times else self._data_start
+
+    def iter_events(self, offset: Optional[int] = None) -> Iterator[dict]:
+        with open(self.path, "rb") as f:
+            f.seek(self._data_start if offset is None else offset)
+            names = self.fieldnames
+
+            for row in csv.reader(io.TextIOWrapper(f, newline="")):
+                yield {name: _convert(name, value) for name, value in zip(names, row)}
+
+    def events_from(self, lap: Optional[int] = None, race_time: Optional[float] = None) -> Iterator[dict]:
+        if lap is not None:
+            offset = self.offset_of_lap(lap)
+
+            if offset is None:
+                return iter(())
+
+            return self.iter_events(offset)
+
+        if race_time is not None:
+            return (e for e in self.iter_events(self.offset_of_time(race_time)) if e["race_time"] >= race_time)
+
+        return self.iter_events()
+
+
+class ColumnStoreSource:
+    def __init__(self, directory: str):
+        from colstore import ColumnStoreReader
+        self.reader = ColumnStoreReader(directory)
+
+    def events_from(self, lap: Optional[int] = None, race_time: Optional[float] = None) -> Iterator[dict]:
+        if lap is not None:
+            start = self.reader.index_of_lap(lap)
+
+        elif race_time is not None:
+            start = self.reader.index_of_time(race_time)
+
+        else:
+            start = 0
+
+        return self.reader.iter_events(start)
+
+
+class RotatingLogSource:
+    def __init__(self, directory: str):
+        from rotlog import RotatingLogReader
+        self.reader = RotatingLogReader(directory)
+
+    def iter_events(self, file_idx: int = 0, offset: int = 0) -> Iterator[dict]:
+        names = self.reader.fieldnames
+
+        for row in self.reader.iter_rows(file_idx, offset):
+            yield {name: _convert(name, value) for name, value in zip(names, row)}
+
+    def events_from(self, lap: Optional[int] = None, race_time: Optional[float] = None) -> Iterator[dict]:
+        if lap is not None:
+            position = self.reader.position_of_lap(lap)
+
+            if position is None:
+                return iter(())
+
+            return self.iter_events(*position)
+
+        if race_time is not None:
+            return (e for e in self.iter_events(*self.reader.position_of_time(race_time)) if e["race_time"] >= race_time)
+
+        return self.iter_events()
+
+
+def open_source(path: str):
+    if os.path.isdir(path):
+        from rotlog import INDEX_FILE
+
+        if os.path.exists(os.path.join(path, INDEX_FILE)):
+            return RotatingLogSource(path)
+
+        return ColumnStoreSource(path)
+
+    return CsvSource(path)
+
+
+def replay(events: Iterator[dict], speed: float = 1.0, emit=sender.send_event) -> int:
+    count = 0
+    start_wall = None
+    start_race = None
+
+    for event in events:
+        race_time = event.get("race_time")
+
+        if speed > 0.0 and race_time is not None:
+            if start_wall is None:
+                start_wall = time.monotonic()
+                start_race = race_time
+
+            delay = start_wall + (race_time - start_race) / speed - time.monotonic()
+
+            if delay > 0.0:
+                time.sleep(delay)
+
+        emit(event)
+        count += 1
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded stint")
+    parser.add_argument("input", type=str, help="Recorded stint: a telemetry CSV file, a columnar store directory or a rotating log directory")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed: 1 for real time, N for N times faster, 0 for as fast as possible")
+    parser.add_argument("--lap", type=int, default=None, help="Start replaying from the first event of this lap")
+    parser.add_argument("--from-time", type=float, default=None, help="Start replaying from this race time, in seconds")
+    parser.add_argument("--send-to-server", action="store_true", help="Send replayed telemetry to Telemetrix instead of the local output")
+    parser.add_argument("--output-format", choices=["csv", "npy", "log"], default="csv", help="Local output format when not sending to the server")
+    parser.add_argument("--output-file", type=str, default=constants.OUTPUT_FILE, help="CSV file for replayed telemetry")
+    parser.add_argument("--output-dir", type=str, default=constants.COLUMN_STORE_DIR, help="Directory for replayed telemetry when --output-format npy is used")
+    parser.add_argument("--log-dir", type=str, default=constants.LOG_DIR, help="Directory for replayed telemetry when --output-format log is used")
+    args = parser.parse_args()
+
+    constants.SEND_TO_SERVER = args.send_to_server
+    constants.OUTPUT_FORMAT = args.output_format
+    constants.OUTPUT_FILE = args.output_file
+    constants.COLUMN_STORE_DIR = args.output_dir
+    constants.LOG_DIR = args.log_dir
+
+    if not args.send_to_server:
+        output = {"npy": args.output_dir, "log": args.log_dir}.get(args.output_format, args.output_file)
+
+        if os.path.abspath(output) == os.path.abspath(args.input):
+            parser.error("Replay output would overwrite the input; choose another --output-file, --output-dir or --log-dir")
+
+    if args.output_format == "npy" and not args.send_to_server and colstore.np is None:
+        parser.error(colstore.NUMPY_MISSING)
+
+    try:
+        source = open_source(args.input)
+
+    except (OSError, ValueError) as e:
+        parser.error(f"Cannot read {args.input}: {e}")
+
+    try:
+        count = replay(source.events_from(args.lap, args.from_time), args.speed)
+
+    except KeyboardInterrupt:
+        count = None
+
+    finally:
+        sender.close()
+
+    print(f"Replayed {count} telemetry events." if count is not None else "Replay interrupted.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import random
+from typing import List, Optional
+
+try:
+    import numpy as np
+
+except ImportError:
+    np = None
+
+
+class SimRng:
+    def __init__(self, seed: Optional[int] = None, block_size: int = 4096):
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 63)
+
+        self.seed = seed
+        self.block_size = block_size
+        self._gen = np.random.default_rng(seed) if np is not None else random.Random(seed)
+
+        self._normals: List[float] = []
+        self._normal_pos = 0
+        self._normals_from = None
+
+    def _gen_state(self):
+        return self._gen.bit_generator.state if np is not None else self._gen.getstate()
+
+    def _set_gen_state(self, state):
+        if np is not None:
+            self._gen.bit_generator.state = state
+
+        else:
+            self._gen.setstate((state[0], tuple(state[1]), state[2]))
+
+    def _refill_normals(self):
+        self._normals_from = self._gen_state()
+
+        if np is not None:
+            self._normals = self._gen.standard_normal(self.block_size).tolist()
+
+        else:
+            self._normals = [self._gen.gauss(0.0, 1.0) for _ in range(self.block_size)]
+
+        self._normal_pos = 0
+
+    def gauss(self, mu: float, sigma: float) -> float:
+        if self._normal_pos >= len(self._normals):
+            self._refill_normals()
+
+        z = self._normals[self._normal_pos]
+        self._normal_pos += 1
+        return mu + sigma * z
+
+    def get_state(self) -> dict:
+        return {
+            "backend": "numpy" if np is not None else "random",
+            "seed": self.seed,
+            "block_size": self.block_size,
+            "gen": self._gen_state(),
+            "normals_from": self._normals_from,
+            "normal_pos": self._normal_pos,
+        }
+
+    def set_state(self, state: dict):
+        backend = "numpy" if np is not None else "random"
+
+        if state["backend"] != backend:
+            raise ValueError(f"RNG state was saved with the {state['backend']} backend, this process uses {backend}")
+
+        self.seed = state["seed"]
+        self.block_size = state["block_size"]
+        self._normals = []
+        self._normal_pos = 0
+
+        if state["normals_from"] is not None:
+            self._set_gen_state(state["normals_from"])
+            self._refill_normals()
+            self._normal_pos = state["normal_pos"]
+
+        self._set_gen_state(state["gen"])
@@ -0,0 +1,495 @@
+import csv
+import io
+import json
+import os
+import time
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4frame
+
+except ImportError:
+    lz4frame = None
+
+INDEX_FILE = "index.json"
+
+
+class _Passthrough:
+    eof = False
+    unused_data = b""
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class _NoCodec:
+    suffix = ""
+    errors = ()
+
+    def __init__(self, level: Optional[int] = None):
+        pass
+
+    def start(self) -> bytes:
+        return b""
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def sync(self) -> bytes:
+        return b""
+
+    def finish(self) -> bytes:
+        return b""
+
+    def decompressor(self):
+        return _Passthrough()
+
+
+class _GzipCodec:
+    suffix = ".gz"
+    errors = (zlib.error,)
+
+    def __init__(self, level: Optional[int] = None):
+        self.level = 6 if level is None else level
+        self._c = None
+
+    def start(self) -> bytes:
+        self._c = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return b""
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def sync(self) -> bytes:
+        return self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+    def decompressor(self):
+        return zlib.decompressobj(31)
+
+
+class _ZstdCodec:
+    suffix = ".zst"
+
+    def __init__(self, level: Optional[int] = None):
+        self.level = 3 if level is None else level
+        self.errors = (zstandard.ZstdError,)
+        self._c = None
+
+    def start(self) -> bytes:
+        self._c = zstandard.ZstdCompressor(level=self.level).compressobj()
+        return b""
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def sync(self) -> bytes:
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+    def decompressor(self):
+        return zstandard.ZstdDecompressor().decompressobj()
+
+
+class _Lz4Codec:
+    suffix = ".lz4"
+    errors = (RuntimeError,)
+
+    def __init__(self, level: Optional[int] = None):
+        self.level = 0 if level is None else level
+        self._c = None
+
+    def start(self) -> bytes:
+        self._c = lz4frame.LZ4FrameCompressor(compression_level=self.level, auto_flush=True)
+        return self._c.begin()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def sync(self) -> bytes:
+        return b""
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+    def decompressor(self):
+        return lz4frame.LZ4FrameDecompressor()
+
+
+class _MemberReader(io.RawIOBase):
+    def __init__(self, f, codec, limit: Optional[int] = None):
+        self._f = f
+        self._codec = codec
+        self._limit = limit
+        self._d = codec.decompressor()
+        self._out = b""
+        self._pos = 0
+        self._tail = b""
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while self._pos >= len(self._out) and not self._done:
+            data = b""
+
+            if self._d.eof:
+                data = self._d.unused_data
+                self._d = self._codec.decompressor()
+
+            if not data and self._limit != 0:
+                data = self._f.read(65_536 if self._limit is None else min(65_536, self._limit))
+
+                if self._limit is not None:
+                    self._limit -= len(data)
+
+            if not data:
+                self._done = True
+                break
+
+            saved = self._d.copy() if hasattr(self._d, "copy") else None
+
+            try:
+                text = self._tail + self._d.decompress(data)
+
+            except self._codec.errors:
+                text = self._tail + self._salvage(saved, data)
+                self._done = True
+
+            cut = text.rfind(b"\n") + 1
+            self._out, self._tail = text[:cut], text[cut:]
+            self._pos = 0
+
+        n = min(len(b), len(self._out) - self._pos)
+        b[:n] = self._out[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def _salvage(self, d, data: bytes) -> bytes:
+        out = []
+
+        if d is None:
+            return b""
+
+        for i in range(len(data)):
+            try:
+                out.append(d.decompress(data[i:i + 1]))
+
+            except self._codec.errors:
+                break
+
+            if d.eof:
+                break
+
+        return b"".join(out)
+
+
+CODECS = {"none": (_NoCodec, True), "gzip": (_GzipCodec, True), "zstd": (_ZstdCodec, zstandard is not None),
+          "lz4": (_Lz4Codec, lz4frame is not None)}
+
+
+def available_compressions() -> List[str]:
+    return [name for name, (_, available) in CODECS.items() if available]
+
+
+def get_codec(name: str, level: Optional[int] = None):
+    if name not in CODECS:
+        raise ValueError(f"Unknown compression '{name}', expected one of: {', '.join(CODECS)}")
+
+    cls, available = CODECS[name]
+
+    if not available:
+        raise ValueError(f"The {name} compression needs the {'zstandard' if name == 'zstd' else name} package, which is not installed")
+
+    return cls(level)
+
+
+def _iter_csv(path: str, offset: int, codec, end: Optional[int] = None) -> Iterator[List[str]]:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        member_reader = _MemberReader(f, codec, None if end is None else end - offset)
+        rows = csv.reader(io.TextIOWrapper(io.BufferedReader(member_reader), newline=""))
+
+        if offset == 0:
+            next(rows, None)
+
+        yield from rows
+
+
+class RotatingLogSink:
+    def __init__(self, directory: str, compression: str = "gzip", max_bytes: Optional[int] = None,
+                 max_laps: Optional[int] = None, max_sim_s: Optional[float] = None, level: Optional[int] = None,
+                 flush_rows: int = 1000, flush_interval_s: float = 1.0):
+        self.directory = directory
+        self.compression = compression
+        self.codec = get_codec(compression, level)
+        self.max_bytes = max_bytes
+        self.max_laps = max_laps
+        self.max_sim_s = max_sim_s
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+
+        self.index: Optional[dict] = None
+        self.run: Optional[dict] = None
+        self._error: Optional[Exception] = None
+        self._file = None
+        self._lap = None
+        self._file_laps = 0
+        self._file_start_time = 0.0
+        self._rows: List[dict] = []
+        self._text = io.StringIO()
+        self._writer = csv.writer(self._text)
+        self._last_flush = time.monotonic()
+
+    def start_run(self, run: dict):
+        self.run = run
+        index_path = os.path.join(self.directory, INDEX_FILE)
+
+        if self.index is None and os.path.exists(index_path):
+            try:
+                with open(index_path) as f:
+                    self._check_index(json.load(f))
+
+            except ValueError as e:
+                self._error = e
+                raise
+
+    def _check_index(self, index: dict):
+        if index["compression"] != self.compression:
+            raise ValueError(f"{self.directory} holds {index['compression']} logs, not {self.compression}")
+
+        if index.get("run") is None or index.get("run") != self.run:
+            raise ValueError(f"{self.directory} holds another run; only resuming that run from its snapshot can "
+                             f"extend it, so use a new directory for this run")
+
+    def _open_index(self, event: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, INDEX_FILE)
+
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+
+            self._check_index(index)
+            self.index = index
+            self._resume_at(event)
+
+        else:
+            self.index = {"compression": self.compression, "fieldnames": list(event.keys()), "files": [], "laps": [],
+                          "run": self.run}
+
+    def _resume_at(self, event: dict):
+        laps = self.index["laps"]
+        files = self.index["files"]
+        keep = 0
+
+        while keep < len(laps) and laps[keep][3] <= event["race_time"]:
+            keep += 1
+
+        if keep == 0:
+            for entry in files:
+                self._remove(entry["name"])
+
+            files.clear()
+            laps.clear()
+            return
+
+        lap, file_idx, offset, start_time = laps[keep - 1]
+
+        if event["lap"] < lap:
+            raise ValueError(f"{self.directory} has lap {lap} at t={event['race_time']:.3f}s, "
+                             f"but the resumed run is on lap {event['lap']}")
+
+        for entry in files[file_idx + 1:]:
+            self._remove(entry["name"])
+
+        path = os.path.join(self.directory, files[file_idx]["name"])
+        time_col = self.index["fieldnames"].index("race_time")
+        lap_col = self.index["fieldnames"].index("lap")
+        kept = [row for row in _iter_csv(path, offset, self.codec)
+                if row[lap_col] == str(lap) and float(row[time_col]) < event["race_time"]]
+
+        del files[file_idx + 1:]
+        del laps[keep - 1:]
+        files[file_idx]["rows"] = sum(1 for _ in _iter_csv(path, 0, self.codec, offset)) if offset else 0
+
+        self._file = open(path, "r+b")
+        self._file.seek(offset)
+        self._file.truncate()
+        self._file_laps = sum(1 for entry in laps if entry[1] == file_idx)
+        self._file_start_time = next((entry[3] for entry in laps if entry[1] == file_idx), start_time)
+
+        if offset == 0:
+            self._writer.writerow(self.index["fieldnames"])
+
+        self._file.write(self.codec.start())
+        laps.append([lap, file_idx, offset, start_time])
+        self._file_laps += 1
+        self._lap = lap
+        self._writer.writerows(kept)
+        files[file_idx]["rows"] += len(kept)
+
+    def _remove(self, name: str):
+        try:
+            os.remove(os.path.join(self.directory, name))
+
+        except FileNotFoundError:
+            pass
+
+    def _open_file(self, event: dict):
+        name = f"telemetry_{len(self.index['files']) + 1:05d}.csv{self.codec.suffix}"
+        self._file = open(os.path.join(self.directory, name), "wb")
+        self.index["files"].append({"name": name, "first_lap": event["lap"], "rows": 0})
+        self._file_laps = 0
+        self._file_start_time = event["race_time"]
+        self._writer.writerow(self.index["fieldnames"])
+
+    def _should_rotate(self, event: dict) -> bool:
+        return ((self.max_laps is not None and self._file_laps >= self.max_laps)
+                or (self.max_bytes is not None and self._file.tell() >= self.max_bytes)
+                or (self.max_sim_s is not None and event["race_time"] - self._file_start_time >= self.max_sim_s))
+
+    def _write_rows(self):
+        if self._rows:
+            self._writer.writerows(map(dict.values, self._rows))
+            self._rows.clear()
+
+        data = self._text.getvalue()
+
+        if data:
+            self._file.write(self.codec.compress(data.encode()))
+            self._text.seek(0)
+            self._text.truncate()
+
+    def _start_lap(self, event: dict):
+        if self._file is not None:
+            self._write_rows()
+            self._file.write(self.codec.finish())
+
+            if self._should_rotate(event):
+                self._file.close()
+                self._file = None
+
+        if self._file is None:
+            self._open_file(event)
+
+        offset = self._file.tell()
+        self._file.write(self.codec.start())
+        self.index["laps"].append([event["lap"], len(self.index["files"]) - 1, offset, event["race_time"]])
+        self._file_laps += 1
+        self._lap = event["lap"]
+
+    def write(self, event: dict):
+        if self._error is not None:
+            raise self._error
+
+        if self.index is None:
+            try:
+                self._open_index(event)
+
+            except Exception as e:
+                self._error = e
+                raise
+
+        if event["lap"] != self._lap:
+            self._start_lap(event)
+
+        self._rows.append(event)
+        self.index["files"][-1]["rows"] += 1
+
+        if len(self._rows) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval_s:
+            self.flush()
+
+    def _write_index(self):
+        tmp_path = os.path.join(self.directory, INDEX_FILE + ".tmp")
+
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+
+        os.replace(tmp_path, os.path.join(self.directory, INDEX_FILE))
+
+    def flush(self):
+        if self._file is not None:
+            self._write_rows()
+            self._file.write(self.codec.sync())
+            self._file.flush()
+            self._write_index()
+
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self._write_rows()
+            self._file.write(self.codec.finish())
+            self._file.close()
+            self._file = None
+            self._write_index()
+
+        self.index = None
+        self._lap = None
+
+
+class RotatingLogReader:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            self.index = json.load(f)
+
+        self.codec = get_codec(self.index["compression"])
+        self.fieldnames: List[str] = self.index["fieldnames"]
+
+    def laps(self) -> List[int]:
+        return [lap for lap, _, _, _ in self.index["laps"]]
+
+    def position_of_lap(self, lap: int) -> Optional[Tuple[int, int]]:
+        for indexed_lap, file_idx, offset, _ in self.index["laps"]:
+            if indexed_lap == lap:
+                return file_idx, offset
+
+        return None
+
+    def position_of_time(self, race_time: float) -> Tuple[int, int]:
+        position = (0, 0)
+
+        for _, file_idx, offset, start_time in self.index["laps"]:
+            if start_time > race_time:
+                break
+
+            position = (file_idx, offset)
+
+        return position
+
+    def _iter_file(self, file_idx: int, offset: int) -> Iterator[List[str]]:
+        return _iter_csv(os.path.join(self.directory, self.index["files"][file_idx]["name"]), offset, self.codec)
+
+    def iter_rows(self, file_idx: int = 0, offset: int = 0) -> Iterator[List[str]]:
+        for i in range(file_idx, len(self.index["files"])):
+            yield from self._iter_file(i, offset if i == file_idx else 0)
+
+    def read_lap(self, lap: int) -> Iterator[List[str]]:
+        position = self.position_of_lap(lap)
+
+        if position is None:
+            return
+
+        lap_col = self.fieldnames.index("lap")
+        wanted = str(lap)
+
+        for row in self.iter_rows(*position):
+            if row[lap_col] != wanted:
+                return
+
+            yield row
@@ -1,8 +1,16 @@
 import argparse
+import sys
+import colstore
 import constants
+from deltastream import parse_policy
+from encoders import available_encoders
+import sender
+from metrics import MetricsServer, SimCollector
+from pacing import RealtimePacer
+from rotlog import available_compressions
+from profiling import PhaseProfiler
 import track
-from sim import Sim
-from track import SEGMENTS, GATES
+from sim import Sim, load_sim
 from vehicle import VEHICLE_PARAMS, VEHICLE_PRESETS
 
 
@@ -10,37 +18,185 @@ def main():
     parser = argparse.ArgumentParser(description="Race Simulator")
     parser.add_argument("--enable-20hz-logging", action="store_true", help="When writing to the CSV file, include all telemetry events (20 per second) in the file")
     parser.add_argument("--send-to-server", action="store_true", help="Send telemetry data to server instead of the CSV file. Telemetrix must be running")
+    parser.add_argument("--sinks", type=str, default=None, help="Feed several outputs at once, e.g. \"csv,http:drop,npy,stdout\". Each sink gets its own queue and thread, with a block or drop policy")
+    parser.add_argument("--delta-stream", action="store_true", help="Send the server and stdout outputs as a compact delta-encoded stream")
+    parser.add_argument("--delta-policy", type=str, default="", help="Per-field delta thresholds and rates, e.g. \"speed:0.5,fuel_l:0.01:1\" (FIELD:THRESHOLD[:RATE_HZ])")
+    parser.add_argument("--encoding", choices=["auto", "json", "orjson", "msgpack"], default="auto", help="Wire format for telemetry batches sent to the server. auto uses orjson when installed")
+    parser.add_argument("--output-format", choices=["csv", "npy", "log"], default="csv", help="Local output format when not sending to the server. log writes compressed, rotating CSV files with a lap index")
+    parser.add_argument("--output-dir", type=str, default=constants.COLUMN_STORE_DIR, help="Directory for the columnar store when --output-format npy is used")
+    parser.add_argument("--log-dir", type=str, default=constants.LOG_DIR, help="Directory for the rotating log when --output-format log is used")
+    parser.add_argument("--compression", choices=["gzip", "zstd", "lz4", "none"], default=constants.LOG_COMPRESSION, help="Compression for the rotating log. zstd and lz4 need the zstandard and lz4 packages")
+    parser.add_argument("--rotate-mb", type=float, default=None, help="Start a new log file once the current one reaches this many megabytes")
+    parser.add_argument("--rotate-laps", type=int, default=None, help="Start a new log file every this many laps")
+    parser.add_argument("--rotate-minutes", type=float, default=None, help="Start a new log file every this many simulated minutes")
     parser.add_argument("--stint-time-s", type=float, default=360.0, help="Simulated stint length in seconds.")
     parser.add_argument("--car-id", type=str, default="#34")
     parser.add_argument("--driver", type=str, default="Nick Parke")
     parser.add_argument("--team", type=str, default="Zenith Racing")
+    parser.add_argument("--verify-gear-table", action="store_true", help="Check every precomputed gear choice against the full gear search")
+    parser.add_argument("--adaptive-dt", action="store_true", help="Vary the integration step with the track: long steps on straights, short steps in corners")
+    parser.add_argument("--realtime", action="store_true", help="Pace the simulation against the wall clock, so events arrive at 20 Hz")
+    parser.add_argument("--realtime-speed", type=float, default=1.0, help="With --realtime, run this many times faster than real time")
+    parser.add_argument("--profile", action="store_true", help="Time each phase of the simulation step and print a summary at the end of the run")
+    parser.add_argument("--profile-json", type=str, default=None, help="With --profile, also write the summary to this JSON file")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve live Prometheus metrics on this port at /metrics while the sim runs")
+    parser.add_argument("--checkpoint", type=str, default=None, help="Save a snapshot of the simulation to this file every --checkpoint-every-min simulated minutes")
+    parser.add_argument("--checkpoint-every-min", type=float, default=10.0, help="Simulated minutes between checkpoints")
+    parser.add_argument("--resume", type=str, default=None, help="Continue the stint saved in this snapshot. With --seed, branch it with a new random seed")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the driver model. Runs with the same seed produce identical telemetry")
+    parser.add_argument("--track", type=str, default=None, help="Track definition to drive: a JSON file, or the name of one in tracks/. E.g. \"default\"")
     parser.add_argument("--vehicle-preset", type=str, default="gt3", help="Which vehicle preset to use. E.g. \"f1\", \"lmdh\"")
     args = parser.parse_args()
 
+    if args.encoding != "auto" and args.encoding not in available_encoders():
+        parser.error(f"--encoding {args.encoding} needs the {args.encoding} package, which is not installed")
+
+    if args.compression not in available_compressions():
+        parser.error(f"--compression {args.compression} needs the {'zstandard' if args.compression == 'zstd' else args.compression} package, which is not installed")
+
+    if any(v is not None and v <= 0 for v in (args.rotate_mb, args.rotate_laps, args.rotate_minutes)):
+        parser.error("--rotate-mb, --rotate-laps and --rotate-minutes must be positive")
+
+    if args.sinks:
+        try:
+            constants.SINKS = sender.parse_sink_spec(args.sinks)
+
+        except ValueError as e:
+            parser.error(str(e))
+
+    if colstore.np is None and (any(name == "npy" for name, _ in constants.SINKS) or
+                                (args.output_format == "npy" and not args.sinks and not args.send_to_server)):
+        parser.error(colstore.NUMPY_MISSING)
+
+    try:
+        constants.DELTA_THRESHOLDS, constants.DELTA_RATES_HZ = parse_policy(args.delta_policy)
+
+    except ValueError as e:
+        parser.error(str(e))
+
+    constants.DELTA_STREAM = args.delta_stream
+
+    if args.checkpoint_every_min <= 0.0:
+        parser.error("--checkpoint-every-min must be positive")
+
+    if args.adaptive_dt and args.realtime:
+        parser.error("--adaptive-dt cannot be combined with --realtime, which paces fixed steps")
+
     constants.ENABLE_20HZ_LOGGING = args.enable_20hz_logging
     constants.SEND_TO_SERVER = args.send_to_server
+    constants.OUTPUT_FORMAT = args.output_format
+    constants.EVENT_ENCODING = args.encoding
+    constants.COLUMN_STORE_DIR = args.output_dir
+    constants.LOG_DIR = args.log_dir
+    constants.LOG_COMPRESSION = args.compression
+    constants.LOG_ROTATE_BYTES = int(args.rotate_mb * 1024 * 1024) if args.rotate_mb is not None else None
+    constants.LOG_ROTATE_LAPS = args.rotate_laps
+    constants.LOG_ROTATE_SIM_S = args.rotate_minutes * 60.0 if args.rotate_minutes is not None else None
+    constants.VERIFY_GEAR_TABLE = args.verify_gear_table
+    constants.ADAPTIVE_DT = args.adaptive_dt
+
+    sink = sender.get_sink()
+    status = sys.stderr if any(name == "stdout" for name, _ in constants.SINKS) else sys.stdout
+
+    profiler = PhaseProfiler() if args.profile else None
+    circuit = None
+
+    if args.track:
+        try:
+            circuit = track.load_track(args.track)
 
-    preset_name = args.vehicle_preset
+        except (OSError, ValueError) as e:
+            parser.error(f"Cannot load track {args.track}: {e}")
 
-    if preset_name not in VEHICLE_PRESETS:
-        print(f"Unknown vehicle preset '{preset_name}', using default (GT3).")
-        params = VEHICLE_PARAMS
+    if args.resume:
+        try:
+            sim = load_sim(args.resume, seed=args.seed, profiler=profiler, circuit=circuit)
+
+        except (OSError, ValueError) as e:
+            parser.error(f"Cannot resume from {args.resume}: {e}")
+
+        print(f"Resumed {sim.params.get('preset_name')} stint at t={sim.state.time_s:.3f}s from {args.resume}", file=status)
 
     else:
-        params = VEHICLE_PRESETS[preset_name]
+        preset_name = args.vehicle_preset
+
+        if preset_name not in VEHICLE_PRESETS:
+            print(f"Unknown vehicle preset '{preset_name}', using default (GT3).", file=status)
+            params = VEHICLE_PARAMS
+
+        else:
+            params = VEHICLE_PRESETS[preset_name]
+
+        params = dict(params)
+        params["preset_name"] = preset_name
+
+        circuit = circuit or track.get_default_track()
+        sim = Sim(params, circuit.segments, circuit.gates, dt=constants.DT, seed=args.seed, profiler=profiler, circuit=circuit)
+        sim.state.position_m = 0.0
+        sim.state.speed_mps = circuit.outlap_speed_kmh / 3.6
+        sim.state.fuel_l = params["fuel_capacity_l"]
+        sim.state.tyre_wear = 0.0
+        sim.state.gear = 1
+
+    sim.status_stream = status
+    print(f"Random seed: {sim.rng.seed}", file=status)
+
+    pacer = RealtimePacer(constants.DT / args.realtime_speed) if args.realtime else None
+    metrics_server = None
+
+    if args.metrics_port is not None:
+        metrics_server = MetricsServer(SimCollector(sim, sink).collect, constants.METRICS_HOST, args.metrics_port)
+        metrics_server.start()
+        print(f"Serving metrics at {metrics_server.url}", file=status)
+
+    try:
+        events = sim.run(sim_time_s=args.stint_time_s, car_id=args.car_id, driver=args.driver, team=args.team,
+                         pacer=pacer, checkpoint_path=args.checkpoint, checkpoint_every_s=args.checkpoint_every_min * 60.0,
+                         resume=args.resume is not None)
+
+    except KeyboardInterrupt:
+        print(f"Interrupted at t={sim.state.time_s:.3f}s. Flushing telemetry output.", file=status)
+        events = sim.event_count
+
+    except ValueError as e:
+        sys.exit(f"Telemetry output failed: {e}")
+
+    finally:
+        sender.close()
+
+        if metrics_server is not None:
+            metrics_server.stop()
+
+    print(f"Sim produced {events} telemetry events.", file=status)
+
+    if pacer is not None:
+        print(pacer.report(), file=status)
+
+    if profiler is not None:
+        print(profiler.summary(), file=status)
+
+        if args.profile_json:
+            profiler.export_json(args.profile_json)
+
+    if constants.SINKS:
+        for queued in sink.sinks:
+            stats = queued.stats()
+            print(f"{queued.name} sink ({stats['policy']}): {stats['written']} written, {stats['dropped']} dropped, "
+                  f"{stats['errors']} errors.", file=status)
+
+            if hasattr(queued.sink, "latency"):
+                print_sender_stats(queued.sink.stats(), status)
+
+        if any(queued.stats()["errors"] for queued in sink.sinks):
+            sys.exit(1)
 
-    params = dict(params)
-    params["preset_name"] = preset_name
+    elif constants.SEND_TO_SERVER:
+        print_sender_stats(sink.stats(), status)
 
-    sim = Sim(params, SEGMENTS, GATES, dt=constants.DT)
-    sim.state.position_m = 0.0
-    sim.state.speed_mps = track.OUTLAP_SPEED_KMH / 3.6
-    sim.state.fuel_l = params["fuel_capacity_l"]
-    sim.state.tyre_wear = 0.0
-    sim.state.gear = 1
 
-    events = sim.run(sim_time_s=args.sim_time_s, car_id=args.car_id, driver=args.driver, team=args.team)
-    print(f"Sim produced {events} telemetry events.")
+def print_sender_stats(stats: dict, stream=None):
+    print(f"Telemetrix sender: {stats['sent']} sent, {stats['dropped']} dropped, "
+          f"{stats['retried']} retried, {stats['failed']} failed.", file=stream)
 
 
 if __name__ == "__main__":
@@ -1,25 +1,510 @@
+import atexit
 import csv
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 import constants
-from constants import SERVER_URL, OUTPUT_FILE
+from constants import SERVER_BULK_URL, OUTPUT_FILE
+from deltastream import DeltaEncoder, DeltaSink
+from encoders import get_encoder
+from metrics import Histogram
 
 
-def send_event(event: dict):
-    if constants.SEND_TO_SERVER:
+class NullSink:
+    consumes_events = False
+
+    def __init__(self):
+        self.count: int = 0
+
+    def write(self, event: dict):
+        self.count += 1
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CsvSink:
+    def __init__(self, path: str = OUTPUT_FILE, flush_rows: int = 1000, flush_interval_s: float = 1.0):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+        self._file = None
+        self._writer = None
+        self._rows: List[dict] = []
+        self._last_flush = time.monotonic()
+
+    def _open(self, fieldnames):
+        self._file = open(self.path, "a", newline="")
+        self._writer = csv.writer(self._file)
+
+        if self._file.tell() == 0:
+            self._writer.writerow(fieldnames)
+
+    def write(self, event: dict):
+        if self._writer is None:
+            self._open(event.keys())
+
+        self._rows.append(event)
+
+        if len(self._rows) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval_s:
+            self.flush()
+
+    def flush(self):
+        if self._writer is not None and self._rows:
+            self._writer.writerows(map(dict.values, self._rows))
+            self._rows.clear()
+            self._file.flush()
+
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+
+class StdoutSink:
+    def __init__(self, stream=None, encoding: str = "auto"):
+        self.stream = stream if stream is not None else sys.__stdout__.buffer
+        self.encoder = get_encoder("json" if encoding == "msgpack" else encoding)
+
+    def write(self, event: dict):
+        self.stream.write(self.encoder.encode(event) + b"\n")
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+_FLUSH = object()
+_CHECKPOINT = object()
+_STOP = object()
+
+
+class _RunStart:
+    def __init__(self, run: dict):
+        self.run = run
+        self.error = None
+
+
+class HttpSink:
+    def __init__(self, url: str = SERVER_BULK_URL, batch_size: int = 100, batch_interval_s: float = 0.25,
+                 queue_size: int = 10_000, max_retries: int = 3, timeout_s: float = 10.0, encoding: str = "auto"):
+        self.url = url
+        self.encoder = get_encoder(encoding)
+        self.batch_size = batch_size
+        self.batch_interval_s = batch_interval_s
+        self.max_retries = max_retries
+        self.timeout_s = timeout_s
+
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = self.encoder.content_type
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+        self.sent: int = 0
+        self.dropped: int = 0
+        self.retried: int = 0
+        self.failed: int = 0
+        self.errors: Dict[str, int] = {}
+        self.latency = Histogram()
+        self._lock = threading.Lock()
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._worker, name="telemetrix-sender", daemon=True)
+        self._thread.start()
+
+    def write(self, event: dict):
         try:
-            response = requests.post(SERVER_URL, json=event, timeout=10.0)
+            self._queue.put_nowait(event)
+
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sent": self.sent, "dropped": self.dropped, "retried": self.retried, "failed": self.failed,
+                    "queued": self._queue.qsize(), "errors": dict(self.errors)}
+
+    def _count_error(self, kind: str):
+        with self._lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def _worker(self):
+        batch: List[dict] = []
+        deadline = 0.0
+
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()) if batch else None)
+
+            except queue.Empty:
+                item = None
+
+            if item is _STOP or item is _FLUSH:
+                self._post(batch)
+                batch = []
+                self._queue.task_done()
+
+                if item is _STOP:
+                    return
+
+                continue
+
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.batch_interval_s
+
+                batch.append(item)
+                self._queue.task_done()
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._post(batch)
+                batch = []
+
+    def _post(self, batch: List[dict]):
+        if not batch:
+            return
+
+        body = self.encoder.encode(batch)
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+
+            try:
+                response = self.session.post(self.url, data=body, timeout=self.timeout_s)
+                self.latency.observe(time.perf_counter() - start)
+
+                if response.status_code < 400:
+                    with self._lock:
+                        self.sent += len(batch)
+                    return
+
+                self._count_error(f"http_{response.status_code // 100}xx")
+                print(f"Error sending {len(batch)} events: {response.status_code} {response.text}", file=sys.stderr)
+
+                if response.status_code < 500 and response.status_code != 429:
+                    break
+
+            except requests.RequestException as e:
+                self.latency.observe(time.perf_counter() - start)
+                self._count_error("timeout" if isinstance(e, requests.Timeout) else "connection")
+                print("POST error:", e, file=sys.stderr)
+
+            if attempt < self.max_retries:
+                with self._lock:
+                    self.retried += 1
+                time.sleep(min(2.0, 0.1 * (2 ** attempt)))
+
+        with self._lock:
+            self.failed += len(batch)
+
+    def flush(self):
+        if self._thread.is_alive():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def checkpoint(self):
+        if self._thread.is_alive():
+            try:
+                self._queue.put_nowait(_FLUSH)
+
+            except queue.Full:
+                pass
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+        self.session.close()
+
+
+class QueuedSink:
+    def __init__(self, sink, name: str, policy: str = "block", queue_size: int = 10_000):
+        if policy not in ("block", "drop"):
+            raise ValueError(f"Unknown queue policy '{policy}', expected 'block' or 'drop'")
+
+        self.sink = sink
+        self.name = name
+        self.policy = policy
+        self.written: int = 0
+        self.dropped: int = 0
+        self.errors: int = 0
+        self._last_error = None
+        self._lock = threading.Lock()
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._worker, name=f"sink-{name}", daemon=True)
+        self._thread.start()
+
+    def write(self, event: dict):
+        if self.policy == "block":
+            self._queue.put(event)
+            return
+
+        try:
+            self._queue.put_nowait(event)
+
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"written": self.written, "dropped": self.dropped, "errors": self.errors,
+                    "queued": self._queue.qsize(), "policy": self.policy}
+
+    def _worker(self):
+        sink = self.sink
+
+        while True:
+            item = self._queue.get()
+
+            try:
+                if item is _STOP:
+                    sink.close()
+                    return
+
+                if item is _FLUSH:
+                    sink.flush()
+
+                elif item is _CHECKPOINT:
+                    getattr(sink, "checkpoint", sink.flush)()
+
+                elif isinstance(item, _RunStart):
+                    try:
+                        sink.start_run(item.run)
+
+                    except Exception as e:
+                        item.error = e
+                        self._last_error = str(e)
+                        raise
+
+                else:
+                    sink.write(item)
+                    self.written += 1
+
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+
+                if str(e) != self._last_error:
+                    self._last_error = str(e)
+                    print(f"Error in {self.name} sink: {e}", file=sys.stderr)
+
+            finally:
+                self._queue.task_done()
+
+    def start_run(self, run: dict):
+        if not hasattr(self.sink, "start_run") or not self._thread.is_alive():
+            return
+
+        item = _RunStart(run)
+        self._queue.put(item)
+        self._queue.join()
+
+        if item.error is not None:
+            raise item.error
+
+    def request_flush(self):
+        if self._thread.is_alive():
+            self._queue.put(_FLUSH)
+
+    def wait(self):
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def flush(self):
+        self.request_flush()
+        self.wait()
+
+    def request_checkpoint(self):
+        if self._thread.is_alive():
+            self._queue.put(_CHECKPOINT)
+
+    def checkpoint(self):
+        self.request_checkpoint()
+        self.wait()
+
+    def request_close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+
+    def join(self):
+        self._thread.join()
+
+    def close(self):
+        self.request_close()
+        self.join()
+
+
+class FanOutSink:
+    def __init__(self, sinks: List[QueuedSink]):
+        self.sinks = sinks
+
+    def write(self, event: dict):
+        for sink in self.sinks:
+            sink.write(event)
+
+    def start_run(self, run: dict):
+        for sink in self.sinks:
+            sink.start_run(run)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.request_flush()
+
+        for sink in self.sinks:
+            sink.wait()
+
+    def checkpoint(self):
+        for sink in self.sinks:
+            sink.request_checkpoint()
+
+        for sink in self.sinks:
+            sink.wait()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.request_close()
+
+        for sink in self.sinks:
+            sink.join()
+
+    def stats(self) -> Dict[str, dict]:
+        return {sink.name: sink.stats() for sink in self.sinks}
+
+
+SINK_NAMES = ("csv", "npy", "log", "http", "stdout", "null")
+DEFAULT_SINK_POLICIES = {"csv": "block", "npy": "block", "log": "block", "http": "drop", "stdout": "block", "null": "drop"}
+
+
+def parse_sink_spec(spec: str) -> List[Tuple[str, str]]:
+    sinks = []
+
+    for part in spec.split(","):
+        name, _, policy = part.strip().partition(":")
+
+        if name not in SINK_NAMES:
+            raise ValueError(f"Unknown sink '{name}', expected one of: {', '.join(SINK_NAMES)}")
+
+        policy = policy or DEFAULT_SINK_POLICIES[name]
+
+        if policy not in ("block", "drop"):
+            raise ValueError(f"Unknown policy '{policy}' for sink '{name}', expected 'block' or 'drop'")
+
+        if any(name == seen for seen, _ in sinks):
+            raise ValueError(f"Sink '{name}' is listed twice")
+
+        sinks.append((name, policy))
+
+    return sinks
+
+
+def _delta(sink):
+    return DeltaSink(sink, DeltaEncoder(constants.DELTA_THRESHOLDS, constants.DELTA_RATES_HZ,
+                                        constants.DELTA_KEYFRAME_INTERVAL_S))
+
+
+def make_sink(name: str):
+    if name == "http":
+        if constants.DELTA_STREAM:
+            return _delta(HttpSink(constants.SERVER_STREAM_URL, constants.HTTP_BATCH_SIZE, constants.HTTP_BATCH_INTERVAL_S,
+                                   constants.HTTP_QUEUE_SIZE, constants.HTTP_MAX_RETRIES, encoding=constants.EVENT_ENCODING))
+
+        return HttpSink(constants.SERVER_BULK_URL, constants.HTTP_BATCH_SIZE, constants.HTTP_BATCH_INTERVAL_S,
+                        constants.HTTP_QUEUE_SIZE, constants.HTTP_MAX_RETRIES, encoding=constants.EVENT_ENCODING)
+
+    if name == "npy":
+        from colstore import ColumnStoreSink
+        return ColumnStoreSink(constants.COLUMN_STORE_DIR)
+
+    if name == "log":
+        from rotlog import RotatingLogSink
+        return RotatingLogSink(constants.LOG_DIR, constants.LOG_COMPRESSION, constants.LOG_ROTATE_BYTES,
+                               constants.LOG_ROTATE_LAPS, constants.LOG_ROTATE_SIM_S, flush_rows=constants.CSV_FLUSH_ROWS,
+                               flush_interval_s=constants.CSV_FLUSH_INTERVAL_S)
+
+    if name == "csv":
+        return CsvSink(constants.OUTPUT_FILE, constants.CSV_FLUSH_ROWS, constants.CSV_FLUSH_INTERVAL_S)
+
+    if name == "stdout":
+        sink = StdoutSink(encoding=constants.EVENT_ENCODING)
+        return _delta(sink) if constants.DELTA_STREAM else sink
+
+    if name == "null":
+        return NullSink()
+
+    raise ValueError(f"Unknown sink '{name}'")
+
+
+_sink = None
+
+
+def get_sink():
+    global _sink
+
+    if _sink is None:
+        if constants.SINKS:
+            _sink = FanOutSink([QueuedSink(make_sink(name), name, policy, constants.SINK_QUEUE_SIZE)
+                                for name, policy in constants.SINKS])
+
+        elif constants.SEND_TO_SERVER:
+            _sink = make_sink("http")
+
+        else:
+            _sink = make_sink(constants.OUTPUT_FORMAT if constants.OUTPUT_FORMAT in ("npy", "log") else "csv")
+
+    return _sink
+
+
+def send_event(event: dict):
+    get_sink().write(event)
+
+
+def start_run(run: dict):
+    sink = get_sink()
+
+    if hasattr(sink, "start_run"):
+        sink.start_run(run)
+
+
+def flush():
+    if _sink is not None:
+        _sink.flush()
+
+
+def checkpoint():
+    if _sink is not None:
+        getattr(_sink, "checkpoint", _sink.flush)()
 
-            if response.status_code >= 400:
-                print(f"Error sending event: {response.status_code} {response.text}")
 
-        except Exception as e:
-            print("POST error:", e)
+def close():
+    global _sink
 
-    else:
-        with open(OUTPUT_FILE, "a", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=event.keys())
+    if _sink is not None:
+        _sink.close()
+        _sink = None
 
-            if f.tell() == 0:
-                writer.writeheader()
 
-            writer.writerow(event)
\ No newline at end of file
+atexit.register(close)
@@ -1,41 +1,77 @@
+import json
 import math
-import random
-import time
+import os
+import uuid
+import zlib
+from dataclasses import asdict, replace
+from bisect import bisect_right
+from time import perf_counter
 from typing import List, Dict, Optional
-from state import CarState, TelemetryEvent
-from track import Segment
+from state import CarState
+from vehicle import VehicleModel, VEHICLE_PRESETS
+from rng import SimRng
+from track import Segment, Track, corner_speed, is_corner
 import track
 from utils import (
     clamp,
-    power_limited_speed,
-    corner_target_speed,
-    engine_power_at_rpm,
-    rpm_from_speed_and_gear,
     max_braking_force,
     fuel_consumption_lps,
 )
-from sender import send_event
+from sender import send_event, checkpoint as checkpoint_events, flush as flush_events, start_run as start_sink_run
 import constants
 
+SNAPSHOT_MAGIC = b"TXSIM\x02"
+
 
 class Sim:
-    def __init__(self, params: dict, segments: List[Segment], gates: Dict[int, float], dt: float = 0.05):
+    def __init__(self, params: dict, segments: List[Segment], gates: Dict[int, float], dt: float = 0.05, sink=None,
+                 seed: Optional[int] = None, profiler=None, circuit: Optional[Track] = None):
         self.params = params
+        self.profiler = profiler
+        self.model = VehicleModel(params)
+        self.rng = SimRng(seed)
+        self.sink = sink
+        self._materialise = getattr(sink, "consumes_events", True)
+        self._vehicle_class = params.get("preset_name")
         self.segments = segments
         self.lap_length = segments[-1].cumulative_end
         self.last_lap_start_time: Optional[float] = 0.0
         self.dt = dt
         self.gates = gates
 
+        if circuit is None:
+            default = track.get_default_track()
+
+            if segments is default.segments and gates is default.gates:
+                circuit = default
+
+            else:
+                circuit = track.build_track("custom", segments, gates, default.outlap_speed_kmh, default.outlap_end_pos_m)
+
+        self.circuit = circuit
+        self._segment_starts = circuit.segment_starts
+        self._last_segment_idx = 0
+
+        gate_table = circuit.gate_table
+        self._gate_dists = [gd for gd, _ in gate_table]
+        self._gate_numbers = [gate_no for _, gate_no in gate_table]
+        self._final_gate = max(gates.keys())
+
         self.state = CarState()
         self.state.fuel_l = self.params.get("fuel_capacity_l", 0.0)
         self._shift_end_time: float = 0.0
+        self._last_dt = dt
+        self._last_accel = 0.0
+        self._tick_index = 0
         self.event_count: int = 0
-        self.prev_gate_index = max(self.gates.keys())
+        self.written_count: int = 0
+        self.step_count: int = 0
+        self.prev_gate_index = self._final_gate
         self.prev_gate_time = 0.0
-        self.last_print = time.time()
+        self.status_stream = None
 
-        self.segment_targets = [self.compute_segment_target(seg) for seg in self.segments]
+        self._penalty_levels = int(round(0.7 / constants.TARGET_PENALTY_STEP)) + 1
+        self._reset_corner_targets(circuit.corner_speeds_for(self._vehicle_class, self.model))
 
         self.driver_params = {
             "driver_skill": self.params.get("driver_skill", 0.9),
@@ -47,48 +83,78 @@ class Sim:
         }
 
         self.driver_state = {"target_wheel_deg": 0.0, "actual_wheel_deg": 0.0,
-                             "lap_bias_deg": random.gauss(0.0, self.driver_params["lap_bias_std_deg"])}
+                             "lap_bias_deg": self.rng.gauss(0.0, self.driver_params["lap_bias_std_deg"])}
         self._last_lap_for_bias = self.state.lap
 
-    def compute_segment_target(self, seg: Segment) -> float:
-        mu = self.params["tyre_mu_initial"] * (1.0 - self.state.tyre_wear * 0.5)
+    def _reset_corner_targets(self, base_speeds: Optional[List[Optional[float]]] = None):
+        step = constants.TARGET_WEAR_STEP
+        level = int(self.state.tyre_wear / step)
 
-        if seg.typ == "arc" and seg.radius and seg.radius > 5.0:
-            v = corner_target_speed(seg.radius, mu)  # m/s
-            return max(6.0, v * 0.92)
+        if self.state.tyre_wear >= (level + 1) * step:
+            level += 1
 
-        else:
-            v = power_limited_speed(self.params["peak_power_kw"], self.params["CdA"], self.params["air_density"])
-            return v * 0.98
+        self._wear_level = level
+        self._wear_rebuild_at = (level + 1) * step
+        self._target_mu = self.model.tyre_mu_initial * (1.0 - level * step * 0.5)
+        self._corner_targets = [[None] * self._penalty_levels if is_corner(seg) else None for seg in self.segments]
+
+        if base_speeds is not None and level == 0:
+            for row, speed in zip(self._corner_targets, base_speeds):
+                if row is not None:
+                    row[0] = speed
+
+    def corner_target(self, seg_idx: int, penalty_level: int) -> float:
+        mu = self._target_mu * (1.0 - penalty_level * constants.TARGET_PENALTY_STEP)
+        target = self._corner_targets[seg_idx][penalty_level] = corner_speed(self.segments[seg_idx], mu)
+        return target
 
     def find_segment_index(self, pos: float) -> int:
         p = pos % self.lap_length
+        i = self._last_segment_idx
+        seg = self.segments[i]
+
+        if seg.cumulative_start <= p < seg.cumulative_end:
+            return i
+
+        i = (i + 1) % len(self.segments)
+        seg = self.segments[i]
 
-        for i, s in enumerate(self.segments):
-            if s.cumulative_start <= p < s.cumulative_end:
-                return i
+        if not (seg.cumulative_start <= p < seg.cumulative_end):
+            i = max(0, bisect_right(self._segment_starts, p) - 1)
 
-        return len(self.segments) - 1
+        self._last_segment_idx = i
+        return i
 
     def update(self, dt: float):
         s = self.state
+        m = self.model
+        prof = self.profiler
+
+        if prof is not None:
+            t0 = perf_counter()
+
         p = s.position_m % self.lap_length
         seg_idx = self.find_segment_index(s.position_m)
         seg = self.segments[seg_idx]
+        steering_lock = m.steering_lock_deg
 
-        base_mu = self.params["tyre_mu_initial"] * (1.0 - s.tyre_wear * 0.5)
+        if prof is not None:
+            t1 = perf_counter()
+            prof.add("segment", t1 - t0)
+            t0 = t1
 
-        if seg.typ == "arc" and seg.radius and seg.radius > 1.0:
-            wheelbase = self.params.get("wheelbase_m", 2.8)
-            steering_ratio = self.params.get("steering_ratio", 14.0)
-            steering_lock = self.params.get("steering_lock_deg", 180.0)
+        base_mu = m.tyre_mu_initial * (1.0 - s.tyre_wear * 0.5)
 
-            delta_rad = math.atan2(wheelbase, seg.radius)
+        if s.tyre_wear >= self._wear_rebuild_at:
+            self._reset_corner_targets()
+
+        if seg.typ == "arc" and seg.radius and seg.radius > 1.0:
+            delta_rad = math.atan2(m.wheelbase_m, seg.radius)
             ideal_front_deg = math.degrees(delta_rad)
-            ideal_wheel_deg = ideal_front_deg * steering_ratio
+            ideal_wheel_deg = ideal_front_deg * m.steering_ratio
 
             if s.lap != self._last_lap_for_bias:
-                self.driver_state["lap_bias_deg"] = random.gauss(0.0, self.driver_params["lap_bias_std_deg"])
+                self.driver_state["lap_bias_deg"] = self.rng.gauss(0.0, self.driver_params["lap_bias_std_deg"])
                 self._last_lap_for_bias = s.lap
 
             desired_wheel_deg = ideal_wheel_deg
@@ -99,19 +165,19 @@ class Sim:
             elif seg.direction == "R":
                 desired_wheel_deg = abs(desired_wheel_deg)
 
-            sr_variation = 1.0 + random.gauss(0.0, self.driver_params["steering_ratio_variation"])
+            sr_variation = 1.0 + self.rng.gauss(0.0, self.driver_params["steering_ratio_variation"])
             desired_wheel_deg = (desired_wheel_deg * sr_variation) + self.driver_state["lap_bias_deg"]
 
             rt = max(0.01, self.driver_params["steering_response_time"])
-            alpha = (dt / (rt + 1e-9))
+            alpha = min(1.0, dt / (rt + 1e-9))
             self.driver_state["target_wheel_deg"] += alpha * (desired_wheel_deg - self.driver_state["target_wheel_deg"])
 
             skill = clamp(self.driver_params["driver_skill"], 0.0, 1.0)
             noise_std = max(0.0, self.driver_params["steering_noise_std_deg"]) * (1.0 - skill)
-            noise = random.gauss(0.0, noise_std)
+            noise = self.rng.gauss(0.0, noise_std)
 
             hand_rt = max(0.02, self.driver_params["steering_response_time"] * 0.6)
-            hand_alpha = (dt / (hand_rt + 1e-9))
+            hand_alpha = min(1.0, dt / (hand_rt + 1e-9))
             self.driver_state["actual_wheel_deg"] += hand_alpha * (
                         (self.driver_state["target_wheel_deg"] + noise) - self.driver_state["actual_wheel_deg"])
 
@@ -124,29 +190,37 @@ class Sim:
             aggress = clamp(self.driver_params["aggressiveness"], 0.0, 1.0)
             grip_penalty = (k_penalty * (steering_error / (lock + 1e-9))) * (1.0 - skill) * (1.0 - 0.4 * aggress)
             grip_penalty = clamp(grip_penalty, 0.0, 0.7)
-            effective_mu = base_mu * (1.0 - grip_penalty)
 
-            target_speed = max(6.0, corner_target_speed(seg.radius, effective_mu) * 0.92)
+            penalty_level = int(grip_penalty / constants.TARGET_PENALTY_STEP + 0.5)
+            target_speed = self._corner_targets[seg_idx][penalty_level]
+
+            if target_speed is None:
+                target_speed = self.corner_target(seg_idx, penalty_level)
 
         else:
-            target_speed = power_limited_speed(self.params["peak_power_kw"], self.params["CdA"], self.params["air_density"]) * 0.98
+            target_speed = m.straight_target_speed
             rt = max(0.05, self.driver_params["steering_response_time"])
-            alpha = (dt / (rt + 1e-9))
+            alpha = min(1.0, dt / (rt + 1e-9))
 
             self.driver_state["target_wheel_deg"] += alpha * (0.0 - self.driver_state["target_wheel_deg"])
             hand_rt = max(0.02, self.driver_params["steering_response_time"] * 0.6)
-            hand_alpha = (dt / (hand_rt + 1e-9))
+            hand_alpha = min(1.0, dt / (hand_rt + 1e-9))
 
             self.driver_state["actual_wheel_deg"] += hand_alpha * (self.driver_state["target_wheel_deg"] - self.driver_state["actual_wheel_deg"])
-            s.steering_deg = clamp(self.driver_state["actual_wheel_deg"], -self.params.get("steering_lock_deg", 180.0), self.params.get("steering_lock_deg", 180.0))
+            s.steering_deg = clamp(self.driver_state["actual_wheel_deg"], -steering_lock, steering_lock)
 
-        outlap_speed_mps = track.OUTLAP_SPEED_KMH / 3.6
-        outlap_end_pos = track.OUTLAP_END_POS_M % self.lap_length
+        outlap_speed_mps = self.circuit.outlap_speed_kmh / 3.6
+        outlap_end_pos = self.circuit.outlap_end_pos_m % self.lap_length
         pos_on_lap = s.position_m % self.lap_length
 
         if s.lap == 1 and pos_on_lap < outlap_end_pos:
             target_speed = min(target_speed, outlap_speed_mps)
 
+        if prof is not None:
+            t1 = perf_counter()
+            prof.add("driver", t1 - t0)
+            t0 = t1
+
         speed = s.speed_mps
         speed_err = target_speed - speed
         kp = 0.8
@@ -168,32 +242,30 @@ class Sim:
             if seg_end_dist < 40.0:
                 s.brake = max(s.brake, 0.8)
 
-        best_gear = s.gear
-        best_score = float('inf')
-
-        for g_idx, gr in enumerate(self.params["gear_ratios"], start=1):
-            rpm_guess = rpm_from_speed_and_gear(speed, gr, self.params["final_drive"], self.params["wheel_radius_m"])
-            rpm_target = 0.65 * self.params["power_rpm_peak"]
-            score = abs(rpm_guess - rpm_target)
+        if prof is not None:
+            t1 = perf_counter()
+            prof.add("controls", t1 - t0)
+            t0 = t1
 
-            if rpm_guess > self.params["redline_rpm"]:
-                score += 1e4
+        best_gear = m.best_gear(speed)
 
-            if score < best_score:
-                best_score = score
-                best_gear = g_idx
+        if constants.VERIFY_GEAR_TABLE and best_gear != m.best_gear_search(speed):
+            raise AssertionError(f"Gear table picked {best_gear} at {speed} m/s, search picked {m.best_gear_search(speed)}")
 
         if best_gear != s.gear:
             s.gear = best_gear
-            s.rpm = min(self.params["redline_rpm"], s.rpm * 1.05 + 200.0)
-            self._shift_end_time = s.time_s + self.params.get("gear_shift_duration", 0.05)
+            s.rpm = min(m.redline_rpm, s.rpm * 1.05 + 200.0)
+            self._shift_end_time = s.time_s + m.gear_shift_duration
             s.throttle = 0.0
 
-        gr = self.params["gear_ratios"][s.gear - 1]
-        s.rpm = rpm_from_speed_and_gear(s.speed_mps, gr, self.params["final_drive"], self.params["wheel_radius_m"])
-        s.rpm = clamp(s.rpm, 700.0, self.params["redline_rpm"])
+        if prof is not None:
+            t1 = perf_counter()
+            prof.add("gear", t1 - t0)
+            t0 = t1
 
-        available_kw = engine_power_at_rpm(s.rpm, self.params["peak_power_kw"], self.params["power_rpm_peak"], self.params["redline_rpm"])
+        s.rpm = clamp(m.rpm(s.speed_mps, s.gear), 700.0, m.redline_rpm)
+
+        available_kw = m.power_curve.power_kw(s.rpm)
 
         if getattr(self, "_shift_end_time", 0.0) > s.time_s:
             available_kw = 0.0
@@ -202,41 +274,36 @@ class Sim:
             self._shift_end_time = 0.0
 
         if s.speed_mps > 1.0:
-            wheel_force_from_power = (available_kw * 1000.0 * self.params["drivetrain_eff"]) / max(1e-3, s.speed_mps)
+            wheel_force_from_power = (available_kw * 1000.0 * m.drivetrain_eff) / max(1e-3, s.speed_mps)
 
         else:
-            wheel_force_from_power = (available_kw * 1000.0 * self.params["drivetrain_eff"]) / 1.0
+            wheel_force_from_power = (available_kw * 1000.0 * m.drivetrain_eff) / 1.0
 
         drive_force = wheel_force_from_power * s.throttle
 
-        F_aero = 0.5 * self.params["air_density"] * self.params["CdA"] * (s.speed_mps ** 2)
-        F_roll = self.params["c_rr"] * self.params["mass_kg_with_fuel"] * constants.G
+        F_aero = m.half_rho_cda * (s.speed_mps ** 2)
 
-        max_brake_force = max_braking_force(self.params["mass_kg_with_fuel"],
-                                            self.params["tyre_mu_initial"] * (1.0 - s.tyre_wear * 0.5),
-                                            constants.G, self.params["brake_max_g"])
+        max_brake_force = max_braking_force(m.mass_with_fuel_kg, base_mu, constants.G, m.brake_max_g)
         brake_force = s.brake * max_brake_force
 
-        net_force = drive_force - F_aero - F_roll - brake_force
-        accel = net_force / self.params["mass_kg_with_fuel"]
+        net_force = drive_force - F_aero - m.F_roll - brake_force
+        accel = net_force / m.mass_with_fuel_kg
 
         s.speed_mps = max(0.0, s.speed_mps + accel * dt)
 
         mech_power_used = available_kw * s.throttle
-        fuel_lps = fuel_consumption_lps(mech_power_used, self.params["engine_efficiency"],
-                                        self.params["fuel_density_kg_per_l"])
+        fuel_lps = fuel_consumption_lps(mech_power_used, m.engine_efficiency, m.fuel_density_kg_per_l)
         s.fuel_l = max(0.0, s.fuel_l - fuel_lps * dt)
 
         lat_accel = 0.0
         if seg.typ == "arc" and seg.radius and seg.radius > 1.0:
             lat_accel = (s.speed_mps ** 2) / seg.radius
 
-        wear_inc = self.params["tyre_wear_rate_base"] * (1.0 + abs(lat_accel) / (0.5 * constants.G)) * (
+        wear_inc = m.tyre_wear_rate_base * (1.0 + abs(lat_accel) / (0.5 * constants.G)) * (
                     1.0 + 0.5 * s.throttle + 0.5 * s.brake)
         s.tyre_wear = clamp(s.tyre_wear + wear_inc * dt, 0.0, 0.99)
 
-        s.steering_deg = clamp(s.steering_deg, -self.params.get("steering_lock_deg", 180.0),
-                               self.params.get("steering_lock_deg", 180.0))
+        s.steering_deg = clamp(s.steering_deg, -steering_lock, steering_lock)
 
         prev_pos = s.position_m
         s.position_m += s.speed_mps * dt
@@ -245,6 +312,9 @@ class Sim:
         if prev_pos % self.lap_length > s.position_m % self.lap_length:
             s.lap += 1
 
+        if prof is not None:
+            prof.add("forces", perf_counter() - t0)
+
         return {
             "accel": accel,
             "available_kw": available_kw,
@@ -256,157 +326,449 @@ class Sim:
             "steering_wheel_deg": s.steering_deg,
         }
 
-    def check_gates_and_emit(self, car_id: str = "#34", driver: str = "Nick Parke", team: str = "Zenith Racing"):
+    def choose_dt(self) -> float:
         s = self.state
-        prev_pos = (s.position_m - s.speed_mps * self.dt) % self.lap_length
-        cur_pos = s.position_m % self.lap_length
+        speed = max(s.speed_mps, 1.0)
+        seg = self.segments[self.find_segment_index(s.position_m)]
+        dt = constants.DT_MAX
+
+        if seg.typ == "arc" and seg.radius:
+            dt = min(dt, constants.ADAPTIVE_MAX_HEADING_RAD * seg.radius / speed)
+
+        else:
+            dt = min(dt, (seg.cumulative_end - s.position_m % self.lap_length) / speed)
+
+        if self._last_accel:
+            dt = min(dt, constants.ADAPTIVE_MAX_DV_MPS / abs(self._last_accel))
+
+        if self._shift_end_time > s.time_s:
+            dt = min(dt, self._shift_end_time - s.time_s)
 
-        for gate_no, gate_dist in self.gates.items():
-            gd = gate_dist % self.lap_length
-            crossed = False
+        return max(constants.DT_MIN, dt)
 
-            if prev_pos <= cur_pos:
-                if prev_pos < gd <= cur_pos:
-                    crossed = True
+    def _crossed_gates(self, prev_pos: float, cur_pos: float):
+        lo = bisect_right(self._gate_dists, prev_pos)
+
+        if prev_pos <= cur_pos:
+            return range(lo, bisect_right(self._gate_dists, cur_pos))
+
+        return [*range(lo, len(self._gate_dists)), *range(bisect_right(self._gate_dists, cur_pos))]
+
+    def _record_gate(self, gate_no: int, t: float, lap: int):
+        split_time = t - self.prev_gate_time
+        self.prev_gate_time = t
+        self.prev_gate_index = gate_no
+
+        if gate_no == self._final_gate:
+            if self.last_lap_start_time is None:
+                self.last_lap_start_time = t
+                lap_time = None
 
             else:
-                if prev_pos < gd <= self.lap_length or 0.0 <= gd <= cur_pos:
-                    crossed = True
-
-            if crossed:
-                split_time = s.time_s - self.prev_gate_time
-                self.prev_gate_time = s.time_s
-                self.prev_gate_index = gate_no
-
-                if gate_no == max(self.gates.keys()):
-                    if self.last_lap_start_time is None:
-                        self.last_lap_start_time = s.time_s
-                        lap_time = None
-
-                    else:
-                        lap_time = s.time_s - self.last_lap_start_time
-                        self.last_lap_start_time = s.time_s
-
-                    if s.lap <= 1:
-                        lap_time = None
-
-                else:
-                    lap_time = None
-
-                evt = TelemetryEvent(
-                    carId=car_id,
-                    driver=driver,
-                    team=team,
-                    lap=s.lap,
-                    gate=gate_no,
-                    split_time=round(split_time, 3),
-                    speed_kmh=round(s.speed_mps * 3.6, 3),
-                    rpm=int(round(s.rpm)),
-                    gear=s.gear,
-                    throttle=round(s.throttle, 3),
-                    brake=round(s.brake, 3),
-                    steering_deg=round(s.steering_deg, 2),
-                    fuel_l=round(s.fuel_l, 3),
-                    tyre_wear=round(s.tyre_wear, 4),
-                    lap_time=round(lap_time, 3) if lap_time is not None else None,
-                    stint_time=round(s.time_s, 3),
-                    extra={"position_m": round(s.position_m % self.lap_length, 3)},
-                )
-
-                self.event_count += 1
-                self._emit_event(evt)
-
-    def _emit_event(self, evt: TelemetryEvent):
-        j = {
-            "carId": evt.carId,
-            "driver": evt.driver,
-            "team": evt.team,
-            "vehicle_class": self.params.get("preset_name"),
-            "lap": evt.lap,
-            "speed": evt.speed_kmh,
-            "rpm": evt.rpm,
-            "gate": evt.gate,
-            "split_time": evt.split_time,
-            "gear": evt.gear,
-            "throttle": evt.throttle,
-            "brake": evt.brake,
-            "steering_deg": evt.steering_deg,
-            "fuel_l": evt.fuel_l,
-            "tyre_wear": evt.tyre_wear,
-            "lap_time": evt.lap_time,
-            "race_time": evt.stint_time,
-            "position_m": evt.extra.get("position_m"),
+                lap_time = t - self.last_lap_start_time
+                self.last_lap_start_time = t
+
+            if lap <= 1:
+                lap_time = None
+
+        else:
+            lap_time = None
+
+        return split_time, lap_time
+
+    def _build_record(self, st: CarState, car_id: str, driver: str, team: str, gate: Optional[int] = None,
+                      split_time: Optional[float] = None, lap_time: Optional[float] = None) -> Optional[dict]:
+        if not self._materialise:
+            return None
+
+        return {
+            "carId": car_id,
+            "driver": driver,
+            "team": team,
+            "vehicle_class": self._vehicle_class,
+            "lap": st.lap,
+            "speed": round(st.speed_mps * 3.6, 3),
+            "rpm": int(round(st.rpm)),
+            "gate": gate,
+            "split_time": round(split_time, 3) if split_time is not None else None,
+            "gear": st.gear,
+            "throttle": round(st.throttle, 3),
+            "brake": round(st.brake, 3),
+            "steering_deg": round(st.steering_deg, 2),
+            "fuel_l": round(st.fuel_l, 3),
+            "tyre_wear": round(st.tyre_wear, 4),
+            "lap_time": round(lap_time, 3) if lap_time is not None else None,
+            "race_time": round(st.time_s, 3),
+            "position_m": round(st.position_m % self.lap_length, 3),
         }
 
-        if constants.ENABLE_20HZ_LOGGING or evt.gate is not None:
-            send_event(j)
+    def check_gates_and_emit(self, car_id: str = "#34", driver: str = "Nick Parke", team: str = "Zenith Racing"):
+        s = self.state
+        prev_pos = (s.position_m - s.speed_mps * self._last_dt) % self.lap_length
+        cur_pos = s.position_m % self.lap_length
+        prof = self.profiler
 
-    def emit_current_telemetry_event(self, car_id: str = "#34", driver: str = "Nick Parke", team: str = "Zenith Racing"):
+        if prof is not None:
+            t0 = perf_counter()
+
+        for i in self._crossed_gates(prev_pos, cur_pos):
+            gate_no = self._gate_numbers[i]
+            split_time, lap_time = self._record_gate(gate_no, s.time_s, s.lap)
+
+            if prof is not None:
+                t1 = perf_counter()
+                prof.add("gates", t1 - t0, 0)
+                t0 = t1
+
+            record = self._build_record(s, car_id, driver, team, gate_no, split_time, lap_time)
+
+            if prof is not None:
+                prof.add("emit.build", perf_counter() - t0)
+
+            self.event_count += 1
+            self._emit_event(record)
+
+            if prof is not None:
+                t0 = perf_counter()
+
+        if prof is not None:
+            prof.add("gates", perf_counter() - t0)
+
+    def _interpolate(self, prev: CarState, f: float) -> CarState:
         s = self.state
-        evt = TelemetryEvent(
-            carId=car_id,
-            driver=driver,
-            team=team,
-            lap=s.lap,
-            gate=None,
-            split_time=None,
-            speed_kmh=round(s.speed_mps * 3.6, 3),
-            rpm=int(round(s.rpm)),
+        pos = prev.position_m + f * (s.position_m - prev.position_m)
+        lap = prev.lap + int((pos + 1e-9) // self.lap_length) - int(prev.position_m // self.lap_length)
+
+        return CarState(
+            position_m=pos,
+            speed_mps=prev.speed_mps + f * (s.speed_mps - prev.speed_mps),
             gear=s.gear,
-            throttle=round(s.throttle, 3),
-            brake=round(s.brake, 3),
-            steering_deg=round(s.steering_deg, 2),
-            fuel_l=round(s.fuel_l, 3),
-            tyre_wear=round(s.tyre_wear, 4),
-            lap_time=None,
-            stint_time=round(s.time_s, 3),
-            extra={"position_m": round(s.position_m % self.lap_length, 3)},
+            rpm=prev.rpm + f * (s.rpm - prev.rpm),
+            throttle=s.throttle,
+            brake=s.brake,
+            steering_deg=s.steering_deg,
+            fuel_l=prev.fuel_l + f * (s.fuel_l - prev.fuel_l),
+            tyre_wear=prev.tyre_wear + f * (s.tyre_wear - prev.tyre_wear),
+            lap=lap,
+            time_s=prev.time_s + f * (s.time_s - prev.time_s),
         )
 
+    def emit_interpolated(self, prev: CarState, car_id: str = "#34", driver: str = "Nick Parke", team: str = "Zenith Racing"):
+        s = self.state
+        prof = self.profiler
+
+        if prof is not None:
+            t0 = perf_counter()
+
+        prev_pos = prev.position_m % self.lap_length
+        travelled = s.position_m - prev.position_m
+        step_time = s.time_s - prev.time_s
+        pending = []
+
+        if travelled > 0.0:
+            for i in self._crossed_gates(prev_pos, s.position_m % self.lap_length):
+                f = ((self._gate_dists[i] - prev_pos) % self.lap_length) / travelled
+                pending.append((f, 0, i))
+
+        if constants.ENABLE_20HZ_LOGGING:
+            while (self._tick_index + 1) * constants.DT <= s.time_s + 1e-9:
+                self._tick_index += 1
+                tick_time = self._tick_index * constants.DT
+                pending.append(((tick_time - prev.time_s) / step_time, 1, tick_time))
+
+        pending.sort()
+
+        for f, is_tick, ref in pending:
+            st = self._interpolate(prev, min(1.0, max(0.0, f)))
+
+            if is_tick:
+                st.time_s = ref
+                gate_no = split_time = lap_time = None
+
+            else:
+                gate_no = self._gate_numbers[ref]
+                st.position_m = self._gate_dists[ref]
+                split_time, lap_time = self._record_gate(gate_no, st.time_s, st.lap)
+
+            if prof is not None:
+                t1 = perf_counter()
+                prof.add("gates", t1 - t0, 0)
+                t0 = t1
+
+            record = self._build_record(st, car_id, driver, team, gate_no, split_time, lap_time)
+
+            if prof is not None:
+                prof.add("emit.build", perf_counter() - t0)
+
+            self.event_count += 1
+            self._emit_event(record)
+
+            if prof is not None:
+                t0 = perf_counter()
+
+        if prof is not None:
+            prof.add("gates", perf_counter() - t0)
+
+    def _emit_event(self, record: Optional[dict]):
+        prof = self.profiler
+
+        if prof is not None:
+            t0 = perf_counter()
+
+        self.written_count += 1
+
+        if self.sink is None:
+            send_event(record)
+
+        else:
+            self.sink.write(record)
+
+        if prof is not None:
+            prof.add("emit.sink", perf_counter() - t0)
+
+    def emit_current_telemetry_event(self, car_id: str = "#34", driver: str = "Nick Parke", team: str = "Zenith Racing"):
         self.event_count += 1
-        self._emit_event(evt)
 
-    def run(self, sim_time_s: float = 200.0, car_id: str = "#34", driver: str = "Nick Parke", team: str = "Zenith Racing"):
-        end_time = sim_time_s
-        max_gate = max(self.gates.keys())
+        if not constants.ENABLE_20HZ_LOGGING:
+            return
+
+        prof = self.profiler
+
+        if prof is not None:
+            t0 = perf_counter()
+
+        record = self._build_record(self.state, car_id, driver, team)
+
+        if prof is not None:
+            prof.add("emit.build", perf_counter() - t0)
+
+        self._emit_event(record)
+
+    def snapshot(self) -> bytes:
+        data = {
+            "params": self.params,
+            "dt": self.dt,
+            "state": asdict(self.state),
+            "driver_state": self.driver_state,
+            "last_lap_for_bias": self._last_lap_for_bias,
+            "shift_end_time": self._shift_end_time,
+            "last_dt": self._last_dt,
+            "last_accel": self._last_accel,
+            "tick_index": self._tick_index,
+            "event_count": self.event_count,
+            "written_count": self.written_count,
+            "step_count": self.step_count,
+            "prev_gate_index": self.prev_gate_index,
+            "prev_gate_time": self.prev_gate_time,
+            "last_lap_start_time": self.last_lap_start_time,
+            "last_segment_idx": self._last_segment_idx,
+            "rng": self.rng.get_state(),
+            "track": {"name": self.circuit.name, "hash": self.circuit.content_hash, "source": self.circuit.source},
+            "run": None,
+        }
+
+        if hasattr(self, "_run_ids"):
+            data["run"] = {
+                "id": self._run_id,
+                "end_time": self._run_end_time,
+                "ids": self._run_ids,
+                "finish_after_next_lap": self._finish_after_next_lap,
+                "extension_start_time": self._extension_start_time,
+            }
+
+        return SNAPSHOT_MAGIC + zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+
+    def restore(self, snapshot: bytes, restore_rng: bool = True):
+        data = _decode_snapshot(snapshot)
+
+        self.state = CarState(**data["state"])
+        self.driver_state = data["driver_state"]
+        self._last_lap_for_bias = data["last_lap_for_bias"]
+        self._shift_end_time = data["shift_end_time"]
+        self._last_dt = data["last_dt"]
+        self._last_accel = data["last_accel"]
+        self._tick_index = data["tick_index"]
+        self.event_count = data["event_count"]
+        self.written_count = data["written_count"]
+        self.step_count = data["step_count"]
+        self.prev_gate_index = data["prev_gate_index"]
+        self.prev_gate_time = data["prev_gate_time"]
+        self.last_lap_start_time = data["last_lap_start_time"]
+        self._last_segment_idx = data["last_segment_idx"]
+
+        self._reset_corner_targets()
+
+        if restore_rng:
+            self.rng.set_state(data["rng"])
+
+        run = data["run"]
+
+        if run is not None:
+            self.begin_run(run["end_time"], *run["ids"])
+            self._run_id = run["id"]
+            self._finish_after_next_lap = run["finish_after_next_lap"]
+            self._extension_start_time = run["extension_start_time"]
+
+    def save_checkpoint(self, path: str):
+        if self.sink is None:
+            checkpoint_events()
+
+        else:
+            getattr(self.sink, "checkpoint", self.sink.flush)()
 
-        finish_after_next_lap = False
-        max_extension_seconds = 150.0
-        extension_start_time = None
+        tmp_path = path + ".tmp"
 
-        while True:
-            prev_gate_before = self.prev_gate_index
-            diagnostics = self.update(self.dt)
+        with open(tmp_path, "wb") as f:
+            f.write(self.snapshot())
+
+        os.replace(tmp_path, path)
+
+    def begin_run(self, sim_time_s: float = 200.0, car_id: str = "#34", driver: str = "Nick Parke", team: str = "Zenith Racing"):
+        self._run_id = uuid.uuid4().hex
+        self._run_end_time = sim_time_s
+        self._run_ids = (car_id, driver, team)
+        self._max_gate = self._final_gate
+        self._finish_after_next_lap = False
+        self._max_extension_seconds = 150.0
+        self._extension_start_time = None
+
+    def step(self) -> bool:
+        car_id, driver, team = self._run_ids
+        end_time = self._run_end_time
+        max_extension_seconds = self._max_extension_seconds
+
+        prev_gate_before = self.prev_gate_index
+        adaptive = constants.ADAPTIVE_DT
+
+        if adaptive:
+            dt = self.choose_dt()
+            prev = replace(self.state)
+
+        else:
+            dt = self.dt
+
+        diagnostics = self.update(dt)
+        self._last_dt = dt
+        self._last_accel = diagnostics["accel"]
+        self.step_count += 1
+
+        if adaptive:
+            self.emit_interpolated(prev, car_id, driver, team)
+
+        else:
             self.check_gates_and_emit(car_id, driver, team)
-            prev_gate_after = self.prev_gate_index
-            crossed_final_now = (prev_gate_before != prev_gate_after) and (prev_gate_after == max_gate)
 
-            if (not finish_after_next_lap) and (self.state.time_s >= end_time):
-                finish_after_next_lap = True
-                extension_start_time = self.state.time_s
-                print(
-                    f"Stint ended at t={self.state.time_s:.3f}s. Stint time extended by {max_extension_seconds}s to allow completion of in-lap.")
+        prev_gate_after = self.prev_gate_index
+        crossed_final_now = (prev_gate_before != prev_gate_after) and (prev_gate_after == self._max_gate)
+
+        if (not self._finish_after_next_lap) and (self.state.time_s >= end_time):
+            self._finish_after_next_lap = True
+            self._extension_start_time = self.state.time_s
+            print(f"Stint ended at t={self.state.time_s:.3f}s. Stint time extended by {max_extension_seconds}s to allow completion of in-lap.",
+                  file=self.status_stream)
+
+        if self._finish_after_next_lap and crossed_final_now:
+            print(f"Finished in-lap at t={self.state.time_s:.3f}s. Stopping simulation.", file=self.status_stream)
+            return False
+
+        if (not self._finish_after_next_lap) and (self.state.time_s < end_time):
+            pass
+
+        elif (not self._finish_after_next_lap) and (self.state.time_s >= end_time):
+            print("Warning: time expired but extension not enabled. Stopping simulation.", file=self.status_stream)
+            return False
 
-            if finish_after_next_lap and crossed_final_now:
-                print(f"Finished in-lap at t={self.state.time_s:.3f}s. Stopping simulation.")
-                break
+        if self._finish_after_next_lap and (self._extension_start_time is not None) and (max_extension_seconds is not None):
+            if (self.state.time_s - self._extension_start_time) > max_extension_seconds:
+                print(f"Warning: finishing lap extension exceeded {max_extension_seconds}s. Stopping simulation.",
+                      file=self.status_stream)
+                return False
 
-            if (not finish_after_next_lap) and (self.state.time_s < end_time):
-                pass
+        if constants.ENABLE_20HZ_LOGGING and not adaptive:
+            self.emit_current_telemetry_event(car_id, driver, team)
 
-            elif (not finish_after_next_lap) and (self.state.time_s >= end_time):
-                print("Warning: time expired but extension not enabled. Stopping simulation.")
-                break
+        return True
 
-            if finish_after_next_lap and (extension_start_time is not None) and (max_extension_seconds is not None):
-                if (self.state.time_s - extension_start_time) > max_extension_seconds:
-                    print(f"Warning: finishing lap extension exceeded {max_extension_seconds}s. Stopping simulation.")
-                    break
+    def run(self, sim_time_s: float = 200.0, car_id: str = "#34", driver: str = "Nick Parke", team: str = "Zenith Racing",
+            pacer=None, checkpoint_path: Optional[str] = None, checkpoint_every_s: float = 600.0, resume: bool = False):
+        if not (resume and hasattr(self, "_run_ids")):
+            self.begin_run(sim_time_s, car_id, driver, team)
 
-            if constants.ENABLE_20HZ_LOGGING:
-                self.emit_current_telemetry_event(car_id, driver, team)
+        run = {"id": self._run_id, "seed": self.rng.seed}
 
-            if random.random() < 0.02:
-                self.segment_targets = [self.compute_segment_target(seg) for seg in self.segments]
+        if self.sink is None:
+            start_sink_run(run)
+
+        elif hasattr(self.sink, "start_run"):
+            self.sink.start_run(run)
+
+        run_start = perf_counter()
+        next_checkpoint = (self.state.time_s // checkpoint_every_s + 1) * checkpoint_every_s
+
+        try:
+            while self.step():
+                if pacer is not None:
+                    pacer.wait()
+
+                if checkpoint_path is not None and self.state.time_s >= next_checkpoint:
+                    self.save_checkpoint(checkpoint_path)
+                    next_checkpoint += checkpoint_every_s
+
+        finally:
+            if self.sink is None:
+                flush_events()
+
+            else:
+                self.sink.flush()
+
+            if self.profiler is not None:
+                self.profiler.run_total_s += perf_counter() - run_start
 
         return self.event_count
+
+
+def make_sim(preset_name: str, sink=None, seed: Optional[int] = None, profiler=None, circuit: Optional[Track] = None,
+             overrides: Optional[dict] = None) -> Sim:
+    params = dict(VEHICLE_PRESETS[preset_name])
+    params.update(overrides or {})
+    params["preset_name"] = preset_name
+    circuit = circuit or track.get_default_track()
+
+    sim = Sim(params, circuit.segments, circuit.gates, dt=constants.DT, sink=sink, seed=seed, profiler=profiler,
+              circuit=circuit)
+    sim.state.position_m = 0.0
+    sim.state.speed_mps = circuit.outlap_speed_kmh / 3.6
+    sim.state.fuel_l = params["fuel_capacity_l"]
+    sim.state.tyre_wear = 0.0
+    sim.state.gear = 1
+    return sim
+
+
+def _decode_snapshot(snapshot: bytes) -> dict:
+    if not snapshot.startswith(SNAPSHOT_MAGIC):
+        raise ValueError("Not a simulation snapshot, or written by an incompatible version")
+
+    return json.loads(zlib.decompress(snapshot[len(SNAPSHOT_MAGIC):]))
+
+
+def load_sim(path: str, sink=None, seed: Optional[int] = None, profiler=None, circuit: Optional[Track] = None) -> Sim:
+    with open(path, "rb") as f:
+        snapshot = f.read()
+
+    data = _decode_snapshot(snapshot)
+    saved = data.get("track")
+
+    if circuit is None:
+        circuit = track.get_default_track()
+
+        if saved is not None and saved["hash"] != circuit.content_hash and saved["source"]:
+            circuit = track.load_track(saved["source"])
+
+    if saved is not None and saved["hash"] != circuit.content_hash:
+        raise ValueError(f"Snapshot was taken on track '{saved['name']}' ({saved['hash']}), "
+                         f"not '{circuit.name}' ({circuit.content_hash})")
+
+    sim = Sim(data["params"], circuit.segments, circuit.gates, dt=data["dt"], sink=sink,
+              seed=data["rng"]["seed"] if seed is None else seed, profiler=profiler, circuit=circuit)
+    sim.restore(snapshot, restore_rng=seed is None)
+    return sim
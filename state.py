@@ -1,5 +1,4 @@
-from dataclasses import dataclass, field
-from typing import Dict, Optional
+from dataclasses import dataclass
 
 
 @dataclass
@@ -16,23 +15,3 @@ class CarState:
     lap: int = 1
     time_s: float = 0.0
 
-
-@dataclass
-class TelemetryEvent:
-    carId: str
-    driver: str
-    team: str
-    lap: int
-    gate: Optional[int]
-    split_time: Optional[float]
-    speed_kmh: float
-    rpm: int
-    gear: int
-    throttle: float
-    brake: float
-    steering_deg: float
-    fuel_l: float
-    tyre_wear: float
-    lap_time: Optional[float]
-    stint_time: float
-    extra: Dict = field(default_factory=dict)
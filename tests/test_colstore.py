@@ -0,0 +1,85 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import constants
+from colstore import ColumnStoreReader, ColumnStoreSink
+from sim import load_sim, make_sim
+
+
+@pytest.fixture(autouse=True)
+def logging_20hz(monkeypatch):
+    monkeypatch.setattr(constants, "ENABLE_20HZ_LOGGING", True)
+
+
+def run_stint(directory, preset_name="gt3", seed=3, checkpoint_path=None):
+    sim = make_sim(preset_name, sink=ColumnStoreSink(directory), seed=seed)
+    sim.run(300, checkpoint_path=checkpoint_path, checkpoint_every_s=120)
+    sim.sink.close()
+
+
+def resume(directory, checkpoint_path, seed=None):
+    sim = load_sim(checkpoint_path, sink=ColumnStoreSink(directory), seed=seed)
+    sim.run(resume=True)
+    sim.sink.close()
+
+
+def assert_same_store(a, b):
+    a, b = ColumnStoreReader(a), ColumnStoreReader(b)
+    assert len(a) == len(b)
+
+    for name in a.columns:
+        assert np.array_equal(a[name], b[name], equal_nan=True), name
+
+
+def test_resume_replaces_events_after_the_checkpoint(tmp_path):
+    run_stint(tmp_path / "ref")
+    run_stint(tmp_path / "store", checkpoint_path=str(tmp_path / "ck.bin"))
+    resume(tmp_path / "store", str(tmp_path / "ck.bin"))
+
+    assert_same_store(tmp_path / "store", tmp_path / "ref")
+    assert np.all(np.diff(ColumnStoreReader(tmp_path / "store")["race_time"]) >= 0.0)
+
+
+def test_resume_of_a_finished_store_appends_nothing(tmp_path):
+    run_stint(tmp_path / "ref", checkpoint_path=str(tmp_path / "ck.bin"))
+    run_stint(tmp_path / "store")
+    rows = len(ColumnStoreReader(tmp_path / "ref"))
+
+    resume(tmp_path / "ref", str(tmp_path / "ck.bin"))
+
+    assert len(ColumnStoreReader(tmp_path / "ref")) == rows
+    assert_same_store(tmp_path / "ref", tmp_path / "store")
+
+
+@pytest.mark.parametrize("preset_name, seed", [("gt3", 3), ("gt3", 99), ("f1", 3)])
+def test_another_run_is_refused_and_leaves_the_store_alone(tmp_path, preset_name, seed):
+    run_stint(tmp_path / "store")
+    rows = len(ColumnStoreReader(tmp_path / "store"))
+
+    with pytest.raises(ValueError, match="holds another run"):
+        run_stint(tmp_path / "store", preset_name, seed)
+
+    assert len(ColumnStoreReader(tmp_path / "store")) == rows
+
+
+def test_resume_with_a_new_seed_is_refused(tmp_path):
+    run_stint(tmp_path / "store", checkpoint_path=str(tmp_path / "ck.bin"))
+
+    with pytest.raises(ValueError, match="holds another run"):
+        resume(tmp_path / "store", str(tmp_path / "ck.bin"), seed=42)
+
+
+def test_a_failed_open_stays_failed(tmp_path):
+    run_stint(tmp_path / "store")
+    rows = len(ColumnStoreReader(tmp_path / "store"))
+    sink = ColumnStoreSink(tmp_path / "store")
+    event = {"carId": "#34", "driver": "Nick Parke", "team": "Zenith Racing", "vehicle_class": "gt3", "lap": 1,
+             "race_time": 0.05}
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            sink.write(event)
+
+    sink.close()
+    assert len(ColumnStoreReader(tmp_path / "store")) == rows
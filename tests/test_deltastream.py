@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+import constants
+from deltastream import (DEFAULT_RATES_HZ, DEFAULT_THRESHOLDS, FIELD_ORDER, GATE_FIELDS, SAMPLED_FIELDS, DeltaDecoder,
+                         DeltaEncoder, DeltaSink)
+from sim import make_sim
+
+
+class ListSink:
+    def __init__(self):
+        self.items = []
+
+    def write(self, item: dict):
+        self.items.append(item)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope="module")
+def events():
+    constants.ENABLE_20HZ_LOGGING, enabled = True, constants.ENABLE_20HZ_LOGGING
+
+    try:
+        sim = make_sim("gt3", sink=ListSink(), seed=5)
+        sim.run(300)
+
+    finally:
+        constants.ENABLE_20HZ_LOGGING = enabled
+
+    return [{name: event.get(name) for name in FIELD_ORDER} for event in sim.sink.items]
+
+
+def encode(events, encoder):
+    sink = DeltaSink(ListSink(), encoder)
+
+    for event in events:
+        sink.write(event)
+
+    return [json.loads(json.dumps(frame)) for frame in sink.sink.items]
+
+
+def test_lossless_policy_round_trips_exactly(events):
+    encoder = DeltaEncoder({name: 0 for name in SAMPLED_FIELDS}, {name: 0 for name in DEFAULT_RATES_HZ})
+    frames = encode(events, encoder)
+
+    assert list(DeltaDecoder().decode_all(frames)) == events
+
+
+def test_default_policy_stays_within_thresholds(events):
+    frames = encode(events, DeltaEncoder())
+    decoded = list(DeltaDecoder().decode_all(frames))
+    kinds = [frame["k"] for frame in frames if frame["k"] != "s"]
+    assert len(decoded) == len(events) == len(kinds)
+
+    for kind, original, event in zip(kinds, events, decoded):
+        if kind == "f" or original["gate"] is not None:
+            assert event == original
+            continue
+
+        assert event["race_time"] == original["race_time"]
+        assert all(event[name] is None for name in GATE_FIELDS)
+
+        for name in SAMPLED_FIELDS:
+            if name not in DEFAULT_RATES_HZ:
+                assert abs(event[name] - original[name]) <= DEFAULT_THRESHOLDS.get(name, 0.0) + 1e-9, name
+
+
+def test_default_policy_is_smaller(events):
+    frames = encode(events, DeltaEncoder())
+
+    assert len(json.dumps(frames)) < len(json.dumps(events)) / 3
+
+
+def test_keyframe_interval(events):
+    frames = encode(events, DeltaEncoder(keyframe_interval_s=10.0))
+    keyframes = [frame["t"] for frame in frames if frame["k"] == "f"]
+
+    assert keyframes[0] == events[0]["race_time"]
+    assert all(b - a <= 10.0 + 0.05 + 1e-9 for a, b in zip(keyframes, keyframes[1:]))
+
+
+def test_session_change_sends_a_session_frame(events):
+    other = [{**event, "carId": "#7"} for event in events[:5]]
+    frames = encode(events[:5] + other, DeltaEncoder())
+
+    assert [frame["c"] for frame in frames if frame["k"] == "s"] == ["#34", "#7"]
+    assert list(DeltaDecoder().decode_all(frames))[5:] == list(DeltaDecoder().decode_all(encode(other, DeltaEncoder())))
@@ -0,0 +1,40 @@
+import math
+import random
+
+import pytest
+
+from vehicle import VEHICLE_PRESETS, VehicleModel
+
+
+@pytest.fixture(params=sorted(VEHICLE_PRESETS))
+def model(request):
+    return VehicleModel(VEHICLE_PRESETS[request.param])
+
+
+def test_table_matches_search_for_every_preset(model):
+    assert model.verify_gear_table(step_mps=0.01) == []
+
+
+def test_table_matches_search_next_to_every_edge(model):
+    rng = random.Random(1)
+
+    for b in model.gear_bounds:
+        for v in (b, math.nextafter(b, 0.0), math.nextafter(b, math.inf), b * (1 + 1e-12), b * (1 - 1e-12)):
+            assert model.best_gear(v) == model.best_gear_search(v), v
+
+    for v in (rng.uniform(0.0, 150.0) for _ in range(20_000)):
+        assert model.best_gear(v) == model.best_gear_search(v), v
+
+
+def test_table_matches_search_with_a_low_redline():
+    params = {**VEHICLE_PRESETS["gt3"], "redline_rpm": 5200.0, "gear_ratios": [3.1, 2.4, 2.35, 1.5, 1.1, 1.05]}
+    model = VehicleModel(params)
+
+    assert model.verify_gear_table(max_speed_mps=150.0, step_mps=0.005) == []
+
+
+def test_shift_map_covers_every_speed(model):
+    bands = model.shift_map()
+
+    assert bands[0][0] == 0.0 and bands[-1][1] == math.inf
+    assert all(a[1] == b[0] and a[2] != b[2] for a, b in zip(bands, bands[1:]))
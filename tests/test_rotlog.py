@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+import constants
+from rotlog import RotatingLogReader, RotatingLogSink, available_compressions
+from sim import load_sim, make_sim
+
+STINT_S = 1300.0
+CRASH_AT_S = 1000.0
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashAt:
+    def __init__(self, sim, time_s: float):
+        self.sim = sim
+        self.time_s = time_s
+
+    def wait(self):
+        if self.sim.state.time_s >= self.time_s:
+            raise Crash()
+
+
+@pytest.fixture(autouse=True)
+def logging_20hz(monkeypatch):
+    monkeypatch.setattr(constants, "ENABLE_20HZ_LOGGING", True)
+
+
+@pytest.fixture(params=available_compressions())
+def compression(request):
+    return request.param
+
+
+def make_log_sim(directory, compression, seed=4):
+    return make_sim("gt3", sink=RotatingLogSink(directory, compression, max_laps=2), seed=seed)
+
+
+def run_reference(directory, compression):
+    sim = make_log_sim(directory, compression)
+    sim.run(STINT_S)
+    sim.sink.close()
+
+
+def run_until_crash(directory, compression, checkpoint_path):
+    sim = make_log_sim(directory, compression)
+
+    with pytest.raises(Crash):
+        sim.run(STINT_S, pacer=CrashAt(sim, CRASH_AT_S), checkpoint_path=checkpoint_path, checkpoint_every_s=420)
+
+    return sim.event_count
+
+
+def test_log_is_readable_after_a_crash(tmp_path, compression):
+    written = run_until_crash(tmp_path / "log", compression, None)
+
+    reader = RotatingLogReader(tmp_path / "log")
+    rows = list(reader.iter_rows())
+    assert len(rows) == written
+    assert all(list(reader.read_lap(lap)) for lap in reader.laps())
+
+
+@pytest.mark.parametrize("tail", [b"12.3,4", bytes(4096)])
+def test_torn_tail_is_dropped(tmp_path, compression, tail):
+    run_until_crash(tmp_path / "log", compression, None)
+    reader = RotatingLogReader(tmp_path / "log")
+    rows = list(reader.iter_rows())
+    last = os.path.join(tmp_path / "log", reader.index["files"][-1]["name"])
+
+    with open(last, "ab") as f:
+        f.write(tail)
+
+    torn = list(RotatingLogReader(tmp_path / "log").iter_rows())
+    assert torn == rows[:len(torn)]
+    assert len(torn) >= len(rows) - 1
+
+
+def test_resume_after_a_crash_matches_an_uninterrupted_run(tmp_path, compression):
+    checkpoint_path = str(tmp_path / "ck.bin")
+    run_reference(tmp_path / "ref", compression)
+    run_until_crash(tmp_path / "log", compression, checkpoint_path)
+
+    sim = load_sim(checkpoint_path, sink=RotatingLogSink(tmp_path / "log", compression, max_laps=2))
+    assert sim.state.time_s < CRASH_AT_S
+    sim.run(resume=True)
+    sim.sink.close()
+
+    log, ref = RotatingLogReader(tmp_path / "log"), RotatingLogReader(tmp_path / "ref")
+    assert list(log.iter_rows()) == list(ref.iter_rows())
+    assert [(lap, start) for lap, _, _, start in log.index["laps"]] == [(lap, start) for lap, _, _, start in ref.index["laps"]]
+    assert [f["rows"] for f in log.index["files"]] == [f["rows"] for f in ref.index["files"]]
+    assert len(set(log.laps())) == len(log.laps())
+
+    for lap in ref.laps():
+        assert list(log.read_lap(lap)) == list(ref.read_lap(lap))
+
+
+def test_another_run_is_refused(tmp_path, compression):
+    run_until_crash(tmp_path / "log", compression, None)
+    rows = list(RotatingLogReader(tmp_path / "log").iter_rows())
+
+    with pytest.raises(ValueError, match="another run"):
+        make_log_sim(tmp_path / "log", compression, seed=9).run(50)
+
+    assert list(RotatingLogReader(tmp_path / "log").iter_rows()) == rows
+
+
+def test_truncated_file_is_readable(tmp_path, compression):
+    run_until_crash(tmp_path / "log", compression, None)
+    reader = RotatingLogReader(tmp_path / "log")
+    rows = list(reader.iter_rows())
+    last = os.path.join(tmp_path / "log", reader.index["files"][-1]["name"])
+    os.truncate(last, os.path.getsize(last) - 7)
+
+    torn = list(RotatingLogReader(tmp_path / "log").iter_rows())
+    assert 0 < len(torn) < len(rows)
+    assert torn == rows[:len(torn)]
@@ -0,0 +1,83 @@
+import pytest
+
+import constants
+from sim import load_sim, make_sim
+
+
+class ListSink:
+    def __init__(self):
+        self.items = []
+
+    def write(self, item: dict):
+        self.items.append(item)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True, params=[False, True], ids=["fixed", "adaptive"])
+def stepping(request, monkeypatch):
+    monkeypatch.setattr(constants, "ENABLE_20HZ_LOGGING", True)
+    monkeypatch.setattr(constants, "ADAPTIVE_DT", request.param)
+
+
+@pytest.mark.parametrize("preset_name", ["gt3", "f1"])
+def test_resume_from_a_checkpoint_reproduces_the_run(tmp_path, preset_name):
+    checkpoint_path = str(tmp_path / "ck.bin")
+    sim = make_sim(preset_name, sink=ListSink(), seed=7)
+    sim.run(1000, checkpoint_path=checkpoint_path, checkpoint_every_s=420)
+    events = sim.sink.items
+
+    resumed = load_sim(checkpoint_path, sink=ListSink())
+    assert 0 < resumed.event_count < len(events)
+    resumed.run(resume=True)
+
+    assert resumed.sink.items == events[len(events) - len(resumed.sink.items):]
+    assert resumed.event_count == sim.event_count
+
+
+def test_restore_in_memory_reproduces_the_next_steps():
+    sim = make_sim("gt3", sink=ListSink(), seed=11)
+    sim.begin_run(600)
+
+    for _ in range(3000):
+        sim.step()
+
+    snapshot = sim.snapshot()
+    del sim.sink.items[:]
+
+    for _ in range(3000):
+        sim.step()
+
+    copy = make_sim("gt3", sink=ListSink(), seed=1)
+    copy.restore(snapshot)
+    assert copy.snapshot() == snapshot
+
+    for _ in range(3000):
+        copy.step()
+
+    assert copy.sink.items == sim.sink.items
+    assert copy.snapshot() == sim.snapshot()
+
+
+def test_new_seed_branches_from_the_saved_state(tmp_path):
+    checkpoint_path = str(tmp_path / "ck.bin")
+    make_sim("gt3", sink=ListSink(), seed=7).run(500, checkpoint_path=checkpoint_path, checkpoint_every_s=420)
+
+    same, branch = load_sim(checkpoint_path, sink=ListSink()), load_sim(checkpoint_path, sink=ListSink(), seed=99)
+    assert same.state == branch.state
+    same.run(resume=True)
+    branch.run(resume=True)
+
+    assert same.sink.items[0]["race_time"] == branch.sink.items[0]["race_time"]
+    assert same.sink.items != branch.sink.items
+
+
+def test_other_files_are_refused(tmp_path):
+    (tmp_path / "ck.bin").write_bytes(b"race_time,speed\n")
+
+    with pytest.raises(ValueError, match="Not a simulation snapshot"):
+        load_sim(str(tmp_path / "ck.bin"))
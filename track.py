@@ -1,5 +1,17 @@
-from dataclasses import dataclass
-from typing import List, Optional
+import functools
+import hashlib
+import json
+import os
+import warnings
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+from utils import corner_target_speed
+from vehicle import VehicleModel, VEHICLE_PRESETS
+
+TRACKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tracks")
+CACHE_DIR_NAME = ".cache"
+ARTIFACT_MAGIC = b"TXTRK\x02"
 
 
 @dataclass
@@ -13,52 +25,199 @@ class Segment:
     cumulative_end: float = 0.0
 
 
-SEGMENTS: List[Segment] = []
-
-_cum = 0.0
-
-
-def add_segment(name, typ, length, radius=None, direction=None):
-    global _cum
-    seg = Segment(name=name, typ=typ, length=length, radius=radius, direction=direction,
-                  cumulative_start=_cum, cumulative_end=_cum + length)
-    SEGMENTS.append(seg)
-    _cum += length
-
-
-add_segment("Start/Finish Straight", "straight", 700.000)
-add_segment("T1 Right Hairpin", "arc", 94.248, radius=45.0, direction='R')
-add_segment("Short Straight A", "straight", 90.000)
-add_segment("T2 Right Tight", "arc", 85.018, radius=65.0, direction='R')
-add_segment("T3 Left Kink", "arc", 27.925, radius=40.0, direction='L')
-add_segment("Medium Straight", "straight", 250.0)
-add_segment("T4 S-entry R", "arc", 79.419, radius=70.0, direction='R')
-add_segment("T5 Esses L", "arc", 62.832, radius=60.0, direction='L')
-add_segment("T6 Right Sweep", "arc", 235.619, radius=150.0, direction='R')
-add_segment("Back Straight", "straight", 900.0)
-add_segment("Chicane", "arc", 35.391, radius=30.0, direction='L')
-add_segment("T7 Left Medium", "arc", 76.771, radius=80.0, direction='L')
-add_segment("Short Straight B", "straight", 120.0)
-add_segment("T8 Right Hairpin", "arc", 99.492, radius=38.0, direction='R')
-add_segment("T9 Left Sweep", "arc", 146.607, radius=120.0, direction='L')
-add_segment("Long Right HighSpeed", "arc", 365.184, radius=220.0, direction='R')
-add_segment("Infield Straight", "straight", 400.0)
-add_segment("T10 Left Tight", "arc", 69.813, radius=50.0, direction='L')
-add_segment("T11 Right Kink", "arc", 18.330, radius=35.0, direction='R')
-add_segment("Complex Esses", "arc", 116.938, radius=50.0, direction='L')
-add_segment("Pre-Finish Straight", "straight", 500.0)
-add_segment("Final Curve Left", "arc", 139.626, radius=160.0, direction='L')
-add_segment("T12 Right Mega-Sweep", "arc", 628.319, radius=300.0, direction='R')
-add_segment("Straight C", "straight", 360.0)
-add_segment("Final Connector", "straight", 350.000)
-
-LAP_LENGTH = SEGMENTS[-1].cumulative_end
-OUTLAP_SPEED_KMH = 80.0
-OUTLAP_END_POS_M = 350.0
-
-GATE_DISTANCES = [
-    198.374, 396.749, 595.123, 793.497, 991.872, 1190.246, 1388.620, 1586.995, 1785.369, 1983.743,
-    2182.118, 2380.492, 2578.866, 2777.240, 2975.615, 3173.989, 3372.363, 3570.738, 3769.112, 3967.486,
-    4165.861, 4364.235, 4562.609, 4760.984, 4959.358, 5157.732, 5356.107, 5554.481, 5752.856, 0.0
-]
-GATES = {i + 1: GATE_DISTANCES[i] for i in range(30)}
+@dataclass
+class Track:
+    name: str
+    segments: List[Segment]
+    gates: Dict[int, float]
+    lap_length: float
+    segment_starts: List[float]
+    gate_table: List[Tuple[float, int]]
+    outlap_speed_kmh: float = 80.0
+    outlap_end_pos_m: float = 350.0
+    corner_speeds: Dict[str, dict] = field(default_factory=dict)
+    content_hash: str = ""
+    source: Optional[str] = None
+
+    def corner_speeds_for(self, preset_name: Optional[str], model: VehicleModel) -> Optional[List[Optional[float]]]:
+        cached = self.corner_speeds.get(preset_name)
+
+        if cached is None or cached["mu"] != model.tyre_mu_initial:
+            return None
+
+        return cached["speeds"]
+
+
+def is_corner(seg: Segment) -> bool:
+    return seg.typ == "arc" and bool(seg.radius) and seg.radius > 1.0
+
+
+def corner_speed(seg: Segment, mu: float) -> Optional[float]:
+    if is_corner(seg):
+        return max(6.0, corner_target_speed(seg.radius, mu) * 0.92)
+
+    return None
+
+
+def segment_starts(segments: List[Segment]) -> List[float]:
+    return [seg.cumulative_start for seg in segments]
+
+
+def build_track(name: str, segments: List[Segment], gates: Dict[int, float], outlap_speed_kmh: float = 80.0,
+                outlap_end_pos_m: float = 350.0, presets: Optional[Dict[str, dict]] = None) -> Track:
+    lap_length = segments[-1].cumulative_end
+    corner_speeds = {}
+
+    for preset_name, params in (presets or {}).items():
+        mu = params["tyre_mu_initial"]
+        corner_speeds[preset_name] = {"mu": mu, "speeds": [corner_speed(seg, mu) for seg in segments]}
+
+    return Track(name=name, segments=segments, gates=gates, lap_length=lap_length, segment_starts=segment_starts(segments),
+                 gate_table=sorted((dist % lap_length, gate_no) for gate_no, dist in gates.items()),
+                 outlap_speed_kmh=outlap_speed_kmh, outlap_end_pos_m=outlap_end_pos_m, corner_speeds=corner_speeds)
+
+
+def parse_track(spec: dict) -> Tuple[List[Segment], Dict[int, float]]:
+    segments = []
+    cum = 0.0
+
+    for i, s in enumerate(spec.get("segments", [])):
+        typ = s.get("type")
+        length = s.get("length")
+        radius = s.get("radius")
+        direction = s.get("direction")
+
+        if typ not in ("straight", "arc"):
+            raise ValueError(f"Segment {i}: type must be 'straight' or 'arc', not {typ!r}")
+
+        if not isinstance(length, (int, float)) or length <= 0.0:
+            raise ValueError(f"Segment {i}: length must be a positive number")
+
+        if typ == "arc" and (not isinstance(radius, (int, float)) or radius <= 0.0 or direction not in ("L", "R")):
+            raise ValueError(f"Segment {i}: an arc needs a positive radius and a direction of 'L' or 'R'")
+
+        segments.append(Segment(name=s.get("name", f"Segment {i + 1}"), typ=typ, length=length, radius=radius,
+                                direction=direction, cumulative_start=cum, cumulative_end=cum + length))
+        cum += length
+
+    if not segments:
+        raise ValueError("A track needs at least one segment")
+
+    lap_length = segments[-1].cumulative_end
+
+    if "gates" in spec:
+        distances = spec["gates"]
+
+    else:
+        count = spec.get("gate_count", 30)
+        distances = [lap_length * (i + 1) / count for i in range(count - 1)] + [0.0]
+
+    if not distances or any(not 0.0 <= d < lap_length for d in distances):
+        raise ValueError(f"Gates must be distances from 0 up to the lap length ({lap_length:.3f} m)")
+
+    return segments, {i + 1: d for i, d in enumerate(distances)}
+
+
+def _artifact_path(path: str, content_hash: str) -> str:
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), CACHE_DIR_NAME, f"{name}-{content_hash}.bin")
+
+
+def _read_artifact(artifact_path: str) -> Optional[Track]:
+    try:
+        with open(artifact_path, "rb") as f:
+            blob = f.read()
+
+        if not blob.startswith(ARTIFACT_MAGIC):
+            return None
+
+        data = json.loads(zlib.decompress(blob[len(ARTIFACT_MAGIC):]))
+        data["segments"] = [Segment(**seg) for seg in data["segments"]]
+        data["gates"] = {int(gate_no): dist for gate_no, dist in data["gates"].items()}
+        data["gate_table"] = [tuple(entry) for entry in data["gate_table"]]
+        return Track(**data)
+
+    except (OSError, zlib.error, ValueError, TypeError, KeyError):
+        return None
+
+
+def _write_artifact(artifact_path: str, circuit: Track):
+    data = asdict(circuit)
+    data["source"] = None
+    tmp_path = artifact_path + ".tmp"
+
+    try:
+        os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+
+        with open(tmp_path, "wb") as f:
+            f.write(ARTIFACT_MAGIC + zlib.compress(json.dumps(data, separators=(",", ":")).encode()))
+
+        os.replace(tmp_path, artifact_path)
+
+    except OSError as e:
+        warnings.warn(f"Could not cache compiled track at {artifact_path}: {e}")
+
+
+def resolve_track_path(name_or_path: str) -> str:
+    if os.path.exists(name_or_path):
+        return name_or_path
+
+    return os.path.join(TRACKS_DIR, name_or_path if name_or_path.endswith(".json") else name_or_path + ".json")
+
+
+def list_tracks() -> List[str]:
+    return sorted(os.path.splitext(f)[0] for f in os.listdir(TRACKS_DIR) if f.endswith(".json"))
+
+
+def load_track(name_or_path: str, use_cache: bool = True) -> Track:
+    path = resolve_track_path(name_or_path)
+
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    digest = hashlib.sha256(raw)
+    digest.update(ARTIFACT_MAGIC)
+    digest.update(json.dumps(VEHICLE_PRESETS, sort_keys=True).encode())
+    content_hash = digest.hexdigest()[:16]
+    artifact_path = _artifact_path(path, content_hash)
+
+    circuit = _read_artifact(artifact_path) if use_cache else None
+
+    if circuit is None:
+        spec = json.loads(raw)
+        segments, gates = parse_track(spec)
+        outlap = spec.get("outlap", {})
+        circuit = build_track(spec.get("name", os.path.basename(path)), segments, gates,
+                              outlap.get("speed_kmh", 80.0), outlap.get("end_pos_m", 350.0), VEHICLE_PRESETS)
+        circuit.content_hash = content_hash
+
+        if use_cache:
+            _write_artifact(artifact_path, circuit)
+
+    circuit.source = path
+    return circuit
+
+
+@functools.lru_cache(maxsize=None)
+def get_default_track() -> Track:
+    return load_track("default")
+
+
+
+_DEFAULT_TRACK_ATTRS = {
+    "DEFAULT_TRACK": lambda circuit: circuit,
+    "SEGMENTS": lambda circuit: circuit.segments,
+    "SEGMENT_STARTS": lambda circuit: circuit.segment_starts,
+    "GATES": lambda circuit: circuit.gates,
+    "GATE_DISTANCES": lambda circuit: [circuit.gates[gate_no] for gate_no in sorted(circuit.gates)],
+    "LAP_LENGTH": lambda circuit: circuit.lap_length,
+    "OUTLAP_SPEED_KMH": lambda circuit: circuit.outlap_speed_kmh,
+    "OUTLAP_END_POS_M": lambda circuit: circuit.outlap_end_pos_m,
+}
+
+
+def __getattr__(name: str):
+    if name not in _DEFAULT_TRACK_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return _DEFAULT_TRACK_ATTRS[name](get_default_track())
@@ -1,6 +1,15 @@
+import csv
 import math
+from bisect import bisect_left
+from typing import List, Sequence, Tuple
 from constants import G, FUEL_HEATING_VALUE_KJ_PER_KG
 
+try:
+    import numpy as np
+
+except ImportError:
+    np = None
+
 
 def clamp(v, a, b):
     return max(a, min(b, v))
@@ -24,6 +33,69 @@ def engine_power_at_rpm(rpm, peak_kw, rpm_peak, redline):
     return peak_kw * val
 
 
+class PowerCurve:
+    def __init__(self, points: Sequence[Tuple[float, float]], max_rpm: float, step_rpm: float = 25.0):
+        points = sorted(points)
+        n = max(1, int(math.ceil(max_rpm / step_rpm)))
+        self.max_rpm = float(max_rpm)
+        self.step_rpm = self.max_rpm / n
+        self._inv_step = 1.0 / self.step_rpm
+
+        rpms = [p[0] for p in points]
+        kws = [p[1] for p in points]
+        self.rpm_grid: List[float] = [i * self.step_rpm for i in range(n + 1)]
+        self.kw_grid: List[float] = [_interp(r, rpms, kws) for r in self.rpm_grid]
+        self._kw_grid_np = np.asarray(self.kw_grid) if np is not None else None
+
+    @classmethod
+    def from_gaussian(cls, peak_kw: float, rpm_peak: float, redline: float, step_rpm: float = 25.0) -> "PowerCurve":
+        n = max(1, int(math.ceil(redline / step_rpm)))
+        rpms = [redline * i / n for i in range(n + 1)]
+        return cls([(r, engine_power_at_rpm(r, peak_kw, rpm_peak, redline)) for r in rpms], redline, step_rpm)
+
+    @classmethod
+    def from_csv(cls, path: str, max_rpm: float, step_rpm: float = 25.0) -> "PowerCurve":
+        with open(path, newline="") as f:
+            points = [(float(row["rpm"]), float(row["kw"])) for row in csv.DictReader(f)]
+
+        return cls(points, max_rpm, step_rpm)
+
+    def power_kw(self, rpm: float) -> float:
+        if rpm <= 0.0:
+            return 0.0
+
+        if rpm >= self.max_rpm:
+            return self.kw_grid[-1]
+
+        x = rpm * self._inv_step
+        i = int(x)
+        y0 = self.kw_grid[i]
+        return y0 + (self.kw_grid[i + 1] - y0) * (x - i)
+
+    def power_kw_many(self, rpms):
+        if np is None:
+            return [self.power_kw(r) for r in rpms]
+
+        rpms = np.asarray(rpms, dtype=float)
+        x = np.clip(rpms, 0.0, self.max_rpm) * self._inv_step
+        i = np.minimum(x.astype(np.intp), len(self.kw_grid) - 2)
+        y0 = self._kw_grid_np[i]
+        kw = y0 + (self._kw_grid_np[i + 1] - y0) * (x - i)
+        return np.where(rpms > 0.0, kw, 0.0)
+
+
+def _interp(x: float, xs: List[float], ys: List[float]) -> float:
+    if x <= xs[0]:
+        return ys[0] * x / xs[0] if xs[0] > 0.0 else ys[0]
+
+    if x >= xs[-1]:
+        return ys[-1]
+
+    hi = bisect_left(xs, x)
+    lo = hi - 1
+    return ys[lo] + (ys[hi] - ys[lo]) * (x - xs[lo]) / (xs[hi] - xs[lo])
+
+
 def wheel_angular_speed_from_vehicle_speed(v_mps, wheel_radius_m):
     return v_mps / wheel_radius_m
 
@@ -1,3 +1,9 @@
+import math
+from bisect import bisect_right
+from typing import List, Tuple
+from constants import G, POWER_CURVE_STEP_RPM
+from utils import PowerCurve, power_limited_speed
+
 VEHICLE_PRESETS = {
     "f1": {
         "mass_kg": 798.0,
@@ -281,3 +287,156 @@ for name, p in VEHICLE_PRESETS.items():
     p["mass_kg_with_fuel"] = p["mass_kg"] + p["fuel_capacity_l"] * p["fuel_density_kg_per_l"]
 
 VEHICLE_PARAMS = VEHICLE_PRESETS["gt3"]
+
+
+class VehicleModel:
+    __slots__ = (
+        "mass_with_fuel_kg", "tyre_mu_initial", "peak_power_kw", "power_rpm_peak", "redline_rpm", "drivetrain_eff", "power_curve",
+        "half_rho_cda", "F_roll", "straight_target_speed", "rpm_target", "gear_ratios", "rpm_per_mps",
+        "gear_shift_duration", "brake_max_g", "tyre_wear_rate_base", "engine_efficiency", "fuel_density_kg_per_l",
+        "wheelbase_m", "steering_ratio", "steering_lock_deg", "gear_bounds", "gear_by_band", "_gear_edges", "_gear_by_gap",
+    )
+
+    def __init__(self, params: dict):
+        self.mass_with_fuel_kg = params["mass_kg_with_fuel"]
+        self.tyre_mu_initial = params["tyre_mu_initial"]
+        self.peak_power_kw = params["peak_power_kw"]
+        self.power_rpm_peak = params["power_rpm_peak"]
+        self.redline_rpm = params["redline_rpm"]
+        self.drivetrain_eff = params["drivetrain_eff"]
+
+        if params.get("power_curve_file"):
+            self.power_curve = PowerCurve.from_csv(params["power_curve_file"], self.redline_rpm, POWER_CURVE_STEP_RPM)
+
+        elif params.get("power_curve"):
+            self.power_curve = PowerCurve(params["power_curve"], self.redline_rpm, POWER_CURVE_STEP_RPM)
+
+        else:
+            self.power_curve = PowerCurve.from_gaussian(self.peak_power_kw, self.power_rpm_peak, self.redline_rpm,
+                                                        POWER_CURVE_STEP_RPM)
+
+        self.half_rho_cda = 0.5 * params["air_density"] * params["CdA"]
+        self.F_roll = params["c_rr"] * params["mass_kg_with_fuel"] * G
+        self.straight_target_speed = power_limited_speed(params["peak_power_kw"], params["CdA"], params["air_density"]) * 0.98
+        self.rpm_target = 0.65 * params["power_rpm_peak"]
+
+        self.gear_ratios = tuple(params["gear_ratios"])
+        rads_to_rpm = 60.0 / (2 * math.pi)
+        self.rpm_per_mps = tuple(gr * params["final_drive"] / params["wheel_radius_m"] * rads_to_rpm for gr in self.gear_ratios)
+
+        self.gear_shift_duration = params.get("gear_shift_duration", 0.05)
+        self.brake_max_g = params["brake_max_g"]
+        self.tyre_wear_rate_base = params["tyre_wear_rate_base"]
+        self.engine_efficiency = params["engine_efficiency"]
+        self.fuel_density_kg_per_l = params["fuel_density_kg_per_l"]
+
+        self.wheelbase_m = params.get("wheelbase_m", 2.8)
+        self.steering_ratio = params.get("steering_ratio", 14.0)
+        self.steering_lock_deg = params.get("steering_lock_deg", 180.0)
+
+        self.gear_bounds, self.gear_by_band = self._build_gear_table()
+        self._gear_edges, self._gear_by_gap = self._build_gear_lookup()
+
+    def rpm(self, speed_mps: float, gear: int) -> float:
+        return speed_mps * self.rpm_per_mps[gear - 1]
+
+    def gear_score(self, speed_mps: float, gear: int) -> float:
+        rpm_guess = speed_mps * self.rpm_per_mps[gear - 1]
+        score = abs(rpm_guess - self.rpm_target)
+
+        if rpm_guess > self.redline_rpm:
+            score += 1e4
+
+        return score
+
+    def best_gear_search(self, speed_mps: float) -> int:
+        best_gear = 1
+        best_score = float('inf')
+
+        for g_idx in range(1, len(self.rpm_per_mps) + 1):
+            score = self.gear_score(speed_mps, g_idx)
+
+            if score < best_score:
+                best_score = score
+                best_gear = g_idx
+
+        return best_gear
+
+    def best_gear(self, speed_mps: float) -> int:
+        i = bisect_right(self._gear_edges, speed_mps)
+
+        if i & 1:
+            return self.best_gear_search(speed_mps)
+
+        return self._gear_by_gap[i >> 1]
+
+    def _score_pieces(self, gear: int) -> List[Tuple[float, float]]:
+        k = self.rpm_per_mps[gear - 1]
+        T = self.rpm_target
+        return [(-k, T), (k, -T), (k, -T + 1e4)]
+
+    def _build_gear_table(self) -> Tuple[List[float], List[int]]:
+        n = len(self.rpm_per_mps)
+        points = set()
+
+        for g in range(1, n + 1):
+            k = self.rpm_per_mps[g - 1]
+            points.add(self.rpm_target / k)
+            points.add(self.redline_rpm / k)
+
+            for h in range(g + 1, n + 1):
+                for a1, b1 in self._score_pieces(g):
+                    for a2, b2 in self._score_pieces(h):
+                        if a1 != a2:
+                            points.add((b2 - b1) / (a1 - a2))
+
+        bounds = sorted(p for p in points if p > 0.0)
+        mids = [bounds[0] * 0.5] + [(lo + hi) * 0.5 for lo, hi in zip(bounds, bounds[1:])] + [bounds[-1] + 1.0]
+        return bounds, [self.best_gear_search(v) for v in mids]
+
+    def _build_gear_lookup(self) -> Tuple[List[float], List[int]]:
+        edges: List[float] = []
+
+        for b in self.gear_bounds:
+            guard = 1e-7 * max(1.0, b)
+
+            if edges and b - guard <= edges[-1]:
+                edges[-1] = b + guard
+
+            else:
+                edges.extend((b - guard, b + guard))
+
+        mids = [edges[0] * 0.5] + [(edges[i] + edges[i + 1]) * 0.5 for i in range(1, len(edges) - 1, 2)] + [edges[-1] + 1.0]
+        return edges, [self.best_gear_search(v) for v in mids]
+
+    def shift_map(self) -> List[Tuple[float, float, int]]:
+        bands = []
+        lo = 0.0
+
+        for hi, gear in zip(self.gear_bounds + [float('inf')], self.gear_by_band):
+            if bands and bands[-1][2] == gear:
+                bands[-1] = (bands[-1][0], hi, gear)
+
+            else:
+                bands.append((lo, hi, gear))
+
+            lo = hi
+
+        return bands
+
+    def verify_gear_table(self, max_speed_mps: float = 120.0, step_mps: float = 0.001) -> List[Tuple[float, int, int]]:
+        speeds = [i * step_mps for i in range(int(max_speed_mps / step_mps) + 1)]
+
+        for b in self.gear_bounds:
+            speeds.extend((math.nextafter(b, 0.0), b, math.nextafter(b, math.inf)))
+
+        mismatches = []
+
+        for v in speeds:
+            table_gear = self.best_gear(v)
+            search_gear = self.best_gear_search(v)
+
+            if table_gear != search_gear:
+                mismatches.append((v, table_gear, search_gear))
+
+        return mismatches